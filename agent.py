@@ -3,15 +3,21 @@ import time
 import re
 import warnings
 import json
+import hashlib
 import sys
 import traceback
 import asyncio
 import subprocess
 import litellm
 import logging
+import logging.handlers
+import queue
+import threading
+import atexit
 import agent_tools
+from collections import deque
 from datetime import datetime
-from typing import Dict, AsyncGenerator, Tuple, Optional, List, Any
+from typing import Dict, Tuple, Optional, List, Any
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,20 +29,17 @@ from google.adk.runners import Runner
 from google.adk.sessions import InMemorySessionService
 from google.adk.models.lite_llm import LiteLlm
 from google.adk.events import Event
-from google.adk.tools.tool_context import ToolContext
-from google.adk.agents import LlmAgent, BaseAgent
-from google.adk.agents.invocation_context import InvocationContext
+from google.adk.agents import LlmAgent
 from google.genai import types
 from google.adk.workflow import Workflow, Edge, node, BaseNode
 from google.adk.agents import Context
 from google.adk.events import EventActions
 from functools import wraps
-from agent_tools import safe_delete_path
+from agent_tools import safe_delete_path, _SAFE_NAME_RE, FUZZ_BUILD_LOG_DIR, FUZZ_BUILD_LOG_PATH
 from agent_tools import (
     read_projects_from_yaml,
     update_yaml_report,
     archive_fixed_project,
-    download_remote_log,
     update_trace_ledger,
     download_github_repo,
     force_clean_git_repo,
@@ -47,18 +50,14 @@ from agent_tools import (
     get_workspace_root,
     checkout_project_commit,
     read_file_content,
-    get_verified_git_sha,
-    get_git_commits_around_date,
-    save_commit_diff_to_file,
+    read_files_batch,
     create_or_update_file,
     run_command,
     check_file_exists,
     extract_buggy_line_info,
-    get_enhanced_history_context,
     run_fuzz_build_and_validate,
     apply_patch,
     commit_workspace_snapshots,
-    update_reflection_journal,
     manage_git_state,
     clear_commit_analysis_state,
     prompt_generate_tool,
@@ -84,41 +83,43 @@ class StreamTee:
 
     def write(self, data):
         self.original_stream.write(data)
-        if data.strip():
+        # isspace() 判空不复制字符串（strip() 会为每次写入分配一份副本）
+        if data and not data.isspace():
             self.agent_logger.log_raw(data)
 
     def flush(self):
         self.original_stream.flush()
 
 
-class LoggingWrapperAgent(BaseAgent):
-    name: str = "LoggingWrapperAgent"
-    # 🔑 优化：变更为 BaseNode 以便包裹 Workflow 对象
-    subject_agent: BaseNode
+class _DeferredFlushFileHandler(logging.FileHandler):
+    """emit 后不逐条 flush，由 _BatchingQueueListener 在队列排空时统一落盘。"""
 
-    async def _run_async_impl(self, context: InvocationContext) -> AsyncGenerator[Event, None]:
-        try:
-            # 🔑 1. 兼容性判定：如果被包装对象拥有旧版 run_async，则走传统 agent 分支
-            if hasattr(self.subject_agent, "run_async"):
-                async for event in self.subject_agent.run_async(context):
-                    GLOBAL_LOGGER.log_event(event)
-                    yield event
-            # 🔑 2. 否则，被包装对象为现代 BaseNode/Workflow，调用 ADK 2.0 标准 run 入口
-            else:
-                # 将 InvocationContext 包装为 Workflow 内部上下文 Context
-                adk_ctx = Context(context)
-                # 安全获取初始用户输入消息作为节点输入
-                node_input = getattr(context, "user_content", None)
+    def _open(self):
+        # 64KiB 块缓冲：突发期间的小记录在用户态合并，每批次只产生少量 write 系统调用
+        return open(self.baseFilename, self.mode, buffering=64 * 1024, encoding=self.encoding, errors=self.errors)
+
+    def flush(self):
+        pass
+
+    def flush_batch(self):
+        super().flush()
+
+
+class _PassthroughQueueHandler(logging.handlers.QueueHandler):
+    """记录均为无参数纯文本消息：入队时不再预先格式化并复制 LogRecord，统一交由监听线程的文件处理器格式化。"""
+
+    def prepare(self, record):
+        return record
 
-                async for event in self.subject_agent.run(ctx=adk_ctx, node_input=node_input):
-                    GLOBAL_LOGGER.log_event(event)
-                    yield event
 
-        except (Exception, KeyboardInterrupt) as e:
-            print(f"\n--- Interruption or error detected: {type(e).__name__} ---");
-            raise e
-        finally:
-            if not GLOBAL_LOGGER.file_handler_setup: GLOBAL_LOGGER.setup_file_handler()
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """突发事件期间连续写入只进文件缓冲区，队列取空时才 flush 一次，日志顺序不变。"""
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                getattr(handler, "flush_batch", handler.flush)()
 
 
 class AgentLogger:
@@ -126,11 +127,27 @@ class AgentLogger:
         self.log_directory = log_directory
         self.logger = None
         self.file_handler_setup = False
-        self.log_buffer = []
+        # 文件句柄建立前的暂存缓冲：定长环形队列，初始化迟迟未完成时只保留最近的记录，内存有界
+        self.log_buffer = deque(maxlen=10000)
         self.project_name = "orchestrator"
+        self._queue_listener = None
+        # 双重检查锁：已初始化时无锁快速返回，并发初始化时仅一个线程挂载文件处理器
+        self._setup_lock = threading.Lock()
+        # 控制台回显开关：AGENT_CONSOLE_LOG=0 时事件只写日志文件，不再经过 stdout
+        self.console_enabled = os.getenv("AGENT_CONSOLE_LOG", "1") == "1"
         os.makedirs(self.log_directory, exist_ok=True)
+        atexit.register(self.stop_listener)
+
+    def stop_listener(self):
+        # 停止后台写盘线程（stop 会先排空队列中剩余的日志记录）
+        if self._queue_listener:
+            self._queue_listener.stop()
+            for handler in self._queue_listener.handlers:
+                handler.close()
+            self._queue_listener = None
 
     def set_project_context(self, project_name: str):
+        self.stop_listener()
         if self.logger:
             for handler in self.logger.handlers[:]:
                 handler.close()
@@ -141,7 +158,12 @@ class AgentLogger:
 
     def setup_file_handler(self):
         if self.file_handler_setup: return
-        safe_project_name = "".join(c for c in self.project_name if c.isalnum() or c in ('_', '-')).rstrip()
+        with self._setup_lock:
+            if self.file_handler_setup: return
+            self._setup_file_handler_locked()
+
+    def _setup_file_handler_locked(self):
+        safe_project_name = _SAFE_NAME_RE.sub('', self.project_name).rstrip()
         timestamp = datetime.now().strftime("%Y.%m.%d_%H.%M.%S")
         log_filename = f"{safe_project_name}_run_{timestamp}.log"
         log_filepath = os.path.join(self.log_directory, log_filename)
@@ -150,18 +172,21 @@ class AgentLogger:
         self.logger.setLevel(logging.INFO)
         self.logger.propagate = False
 
-        file_handler = logging.FileHandler(log_filepath, encoding='utf-8')
+        file_handler = _DeferredFlushFileHandler(log_filepath, encoding='utf-8')
         formatter = logging.Formatter('%(message)s')
         file_handler.setFormatter(formatter)
 
         if not self.logger.handlers:
-            self.logger.addHandler(file_handler)
+            # 🔑 日志记录只入队即返回，由 QueueListener 后台线程写盘，事件分发路径不再阻塞在磁盘 write 上
+            log_queue = queue.SimpleQueue()
+            self.logger.addHandler(_PassthroughQueueHandler(log_queue))
+            self._queue_listener = _BatchingQueueListener(log_queue, file_handler)
+            self._queue_listener.start()
 
         print(f"✅ Log file created: {log_filepath}")
 
-        for log_entry in self.log_buffer:
-            self.logger.info(log_entry)
-        self.log_buffer = []
+        while self.log_buffer:
+            self.logger.info(self.log_buffer.popleft())
         self.file_handler_setup = True
 
     def log_raw(self, message: str):
@@ -173,11 +198,19 @@ class AgentLogger:
             self.log_buffer.append(msg)
 
     def log_event(self, event: Event):
-        log_message = self._format_message(event)
-        if log_message:
-            print(log_message)
+        log_parts = self._format_message(event)
+        if log_parts is None:
+            return
+        if self.console_enabled:
+            # 单次 write（StreamTee 同步落盘），省去 print 的分隔符/换行两次写入；末尾空段使 join 自带换行
+            log_parts.append("")
+            sys.stdout.write("\n".join(log_parts))
+        else:
+            # 仅写文件时每个子项各成一条记录，无需先拼接整段消息
+            for part in log_parts:
+                self.log_raw(part)
 
-    def _format_message(self, event: Event) -> str:
+    def _format_message(self, event: Event) -> Optional[List[str]]:
         author = event.author
         log_parts = [f"EVENT from author: '{author}'"]
         if event.usage_metadata:
@@ -194,13 +227,23 @@ class AgentLogger:
         if (actions := event.actions):
             if actions.state_delta: log_parts.append(f"  - STATE_UPDATE: {actions.state_delta}")
             if actions.escalate: log_parts.append("  - ACTION: Escalate (Agent Finish)")
-        return "\n".join(log_parts)
+        # 仅有作者行（纯文本/内部簿记事件）时无可记录内容，直接跳过，不产生空写入
+        return log_parts if len(log_parts) > 1 else None
+
+
+# 指令文件缓存：{路径: (mtime_ns, 文本)}
+_INSTRUCTION_CACHE: Dict[str, Tuple[int, str]] = {}
 
 
 def load_instruction_from_file(filename: str) -> str:
+    # 每个项目/重试轮次重建 Agent 时复用读取结果；mtime 变化即重新读取，长批次运行中编辑过的指令文件会被重新加载
     try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            return f.read()
+        mtime_ns = os.stat(filename).st_mtime_ns
+        cached = _INSTRUCTION_CACHE.get(filename)
+        if cached is None or cached[0] != mtime_ns:
+            with open(filename, 'r', encoding='utf-8') as f:
+                cached = _INSTRUCTION_CACHE[filename] = (mtime_ns, f.read())
+        return cached[1]
     except FileNotFoundError:
         print(f"Warning: Instruction file '{filename}' not found. The agent will use an empty instruction.")
         return ""
@@ -262,11 +305,59 @@ async def _safe_memory_cleaning(session_service: InMemorySessionService, session
     # }
 
 
+async def _create_attempt_session(session_service: InMemorySessionService, session_id: str, attempt_id: int):
+    """
+    创建本次尝试的会话。🔑 get_session 返回的是深拷贝，直接改写其 state 不会回写到存储会话；
+    工具侧需要读取的 attempt_id/round_id 必须经 create_session(state=...) 持久化。
+    """
+    await session_service.create_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id,
+                                         state={"attempt_id": attempt_id, "round_id": 0})
+    return await session_service.get_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+
+
+def _complete_cbsc_backfill(classification: dict, val_report: dict, state: dict):
+    """将 CBSC 分类结果回填至账本最新节点。"""
+    determined_stage = classification["determined_stage"]
+
+    print(
+        f"[DBG] before backfill: round_id={state.get('round_id')}, current_node_id={state.get('current_node_id')}")
+    ledger_for_stage = TraceLedgerManager.load_ledger()
+    print(
+        f"[DBG] ledger last node id={ledger_for_stage['nodes'][-1]['node_id'] if ledger_for_stage.get('nodes') else 'EMPTY'}")
+    if ledger_for_stage.get("nodes"):
+        target_node_id = ledger_for_stage["nodes"][-1].get("node_id", 0)
+    else:
+        target_node_id = 0
+    print(
+        f"[DBG] target_node_id={target_node_id}, determined_stage={determined_stage}")
+
+    bitmap_keys = [
+        "step_1_official_list",
+        "step_2_infra_compliance",
+        "step_3_sanitizer_injected",
+        "step_4_engine_control",
+        "step_5_logic_linkage",
+        "step_6_runtime_stability"
+    ]
+    step_1_6_bitmap = [
+        1 if str(val_report.get(key, "")).startswith("pass") else 0
+        for key in bitmap_keys
+    ]
+
+    TraceLedgerManager.update_node_fields(target_node_id, {
+        "metrics.build_stage_after": determined_stage,
+        "validation.validation_report_after": val_report,
+        "validation.step_1_6_bitmap": step_1_6_bitmap
+    })
+    print(
+        f"--- [补全] Node {target_node_id} build_stage_after = {determined_stage} ---")
+
+
 def cleanup_environment(project_name: str):
     print(f"--- 🧹 Tool: cleanup_environment for: {project_name} ---")
 
     debug_paths = [
-        "fuzz_build_log_file/fuzz_build_log.txt",
+        FUZZ_BUILD_LOG_PATH,
         "generated_prompt_file/prompt.txt",
         "generated_prompt_file/file_tree.txt",
         "generated_prompt_file/commit_changed.txt",
@@ -277,7 +368,7 @@ def cleanup_environment(project_name: str):
         print(f"  - [DEBUG cleanup] exists={os.path.exists(debug_path)} path={debug_path}")
 
     paths_to_remove = [
-        "fuzz_build_log_file",
+        FUZZ_BUILD_LOG_DIR,
         "generated_prompt_file",
         "oss-fuzz",
         "solution.txt",
@@ -382,7 +473,7 @@ def _generate_final_report(
 
     # ── 6. 归档 result.txt 到项目归档目录 ───────────────────────────────
     try:
-        safe_name = "".join(c for c in project_name if c.isalnum() or c in ('_', '-')).rstrip()
+        safe_name = _SAFE_NAME_RE.sub('', project_name).rstrip()
         archive_dir = os.path.join(os.getcwd(), "archive", safe_name)
         os.makedirs(archive_dir, exist_ok=True)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -396,11 +487,6 @@ def _generate_final_report(
         print(f"--- ⚠️ [REPORT] Failed to archive result.txt: {e} ---")
 
 
-def exit_loop(tool_context: ToolContext):
-    tool_context.actions.escalate = True
-    return {"status": "SUCCESS"}
-
-
 GLOBAL_LOGGER = AgentLogger()
 
 APP_NAME = "fix_build_agent_app"
@@ -414,6 +500,20 @@ PROJECT_TIMEOUT_LIMIT = 10800
 LLM_SEED = 42
 top_p = 0.9
 
+_BANNER_RULE = "=" * 60
+
+# 共享模型客户端缓存：采样参数相同的 Agent 复用同一个 LiteLlm 实例（跨项目/重试轮次保持连接池复用）
+_LLM_CLIENTS: Dict[Tuple, LiteLlm] = {}
+
+
+def _shared_llm(**sampling_params) -> LiteLlm:
+    key = (MODEL, api_base, API_KEY, LLM_SEED, tuple(sorted(sampling_params.items())))
+    client = _LLM_CLIENTS.get(key)
+    if client is None:
+        client = LiteLlm(model=MODEL, api_base=api_base, api_key=API_KEY, seed=LLM_SEED, **sampling_params)
+        _LLM_CLIENTS[key] = client
+    return client
+
 
 def _is_step_2_success(validation_report: dict) -> bool:
     if not isinstance(validation_report, dict):
@@ -421,6 +521,149 @@ def _is_step_2_success(validation_report: dict) -> bool:
     return str(validation_report.get("step_2_infra_compliance", "")).strip() == "pass"
 
 
+def _node_input_text(node_input: Any) -> str:
+    """从节点输入中提取文本：兼容纯字符串与 types.Content 形式的用户消息。"""
+    if isinstance(node_input, str):
+        return node_input
+    parts = getattr(node_input, "parts", None) or []
+    return "".join(getattr(p, "text", None) or "" for p in parts)
+
+
+def _run_deterministic_setup(params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    按 initial_setup_instruction 的固定步骤直接调用环境工具并产出 basic_information（不含基线初始化）；
+    输入缺失关键字段或任一步骤失败时返回 None，交由 LLM 版 initial_setup_agent 兜底。
+    本函数不改变进程工作目录，可在工作线程中执行。
+    """
+    project_name = params.get("project_name")
+    oss_fuzz_sha = params.get("oss_fuzz_sha")
+    if not project_name or not oss_fuzz_sha:
+        return None
+
+    def ok(res: Any) -> bool:
+        return isinstance(res, dict) and res.get("status") == "success"
+
+    # Step 1: 下游 oss-fuzz 克隆、清理与版本对齐
+    if not ok(download_github_repo("oss-fuzz", "./oss-fuzz", "https://github.com/google/oss-fuzz.git")):
+        return None
+    if not ok(force_clean_git_repo("./oss-fuzz")):
+        return None
+    if not ok(checkout_oss_fuzz_commit(oss_fuzz_sha)):
+        return None
+
+    # Step 2: 元数据合并（初始输入优先，日志解析结果仅补空缺）+ 依赖强制提取
+    merged = {k: params.get(k, "") for k in
+              ["software_repo_url", "software_sha", "engine", "sanitizer", "architecture", "base_image_digest"]}
+    dependencies = []
+    meta_res = extract_build_metadata_from_log(params.get("original_log_path") or "")
+    if ok(meta_res):
+        log_meta = meta_res.get("metadata", {})
+        dependencies = log_meta.get("dependencies", [])
+        for key, val in merged.items():
+            if not val or val == "N/A":
+                merged[key] = log_meta.get(key, "")
+    if not merged["software_repo_url"] or not merged["software_sha"]:
+        return None
+    if not ok(patch_project_dockerfile(project_name, "./oss-fuzz", merged["base_image_digest"], dependencies)):
+        return None
+
+    # Step 3: 上游源码克隆与版本对齐
+    paths = get_project_paths(project_name)
+    source_path = paths["project_source_path"]
+    if not ok(download_github_repo(project_name, source_path, merged["software_repo_url"])):
+        return None
+    if not ok(checkout_project_commit(source_path, merged["software_sha"])):
+        return None
+
+    return {
+        "build_mode": "source",
+        "project": project_name,
+        "project_name": project_name,
+        "project_source_path": source_path,
+        "project_config_path": paths["project_config_path"],
+        "project_config_repo_path": paths["project_config_repo_path"],
+        "error_time": params.get("error_time", ""),
+        **merged,
+        "root_cause_commit": params.get("root_cause_commit", ""),
+        "root_cause_workspace": params.get("root_cause_workspace", ""),
+    }
+
+
+def _init_setup_baselines(source_path: str) -> bool:
+    """
+    Step 4: 双仓库基线节点初始化（每个工作区仅一次）。
+    🔑 manage_git_state 使用进程级 os.chdir，必须在事件循环线程上调用，不能放进工作线程。
+    oss-fuzz 初始化失败时尚未触碰任何工作区，返回 False 交由 LLM 兜底；
+    oss-fuzz 已初始化而源码仓库失败时，LLM 兜底会重放整套步骤并再次初始化 oss-fuzz，
+    因此直接抛出异常，由编排层按崩溃处理并重试整个 attempt。
+    """
+    def ok(res: Any) -> bool:
+        return isinstance(res, dict) and res.get("status") == "success"
+
+    if not ok(manage_git_state("./oss-fuzz", "init")):
+        return False
+    res = manage_git_state(source_path, "init")
+    if not ok(res):
+        raise RuntimeError(f"Baseline init failed for {source_path} after ./oss-fuzz was initialized: "
+                           f"{res.get('message') if isinstance(res, dict) else res}")
+    return True
+
+
+async def _setup_fast_path(node_input: Any) -> Event:
+    """环境初始化快速路径：成功时路由 ready 并下发 basic_information，否则路由 fallback。"""
+    try:
+        params = json.loads(_node_input_text(node_input))
+    except (TypeError, ValueError):
+        params = None
+    basic_information = await asyncio.to_thread(_run_deterministic_setup, params) \
+        if isinstance(params, dict) else None
+    if basic_information is not None and not _init_setup_baselines(basic_information["project_source_path"]):
+        basic_information = None
+    if basic_information is None:
+        print("--- [initial_setup_fast_path] Falling back to LLM-driven initial_setup_agent. ---")
+        return Event(route="fallback")
+    return Event(route="ready", actions=EventActions(state_delta={"basic_information": basic_information}))
+
+
+_NOOP_PATCH_NOTE = ("The previous solution was applied successfully but changed no files: every replacement "
+                    "was already present, so the build result is unchanged. Propose a different modification.")
+
+
+def _last_apply_patch_response(events: List[Event]) -> Optional[Dict[str, Any]]:
+    """倒序查找本轮 applier 的最近一次 apply_patch 响应；越过本轮 solver 事件仍未找到则返回 None。"""
+    for event in reversed(events or []):
+        for resp in event.get_function_responses() or []:
+            if resp.name == 'apply_patch':
+                return resp.response
+        if event.author == 'fuzzing_solver_agent':
+            return None
+    return None
+
+
+def _rebuild_gate(events: List[Event]) -> Event:
+    """
+    补丁应用成功但未改变任何文件时，重建结果必然与上一轮一致：跳过 run_fuzz_and_collect_log_agent，
+    直接交给 router 进入下一轮，并在状态中留下 no-op 提示供 prompt_generate_tool 注入给 solver。
+    """
+    resp = _last_apply_patch_response(events)
+    if isinstance(resp, dict) and resp.get("status") == "success" and resp.get("changed_files_count") == 0:
+        print("--- ⚠️ [rebuild_gate] Applied solution changed no files. Skipping the identical rebuild. ---")
+        return Event(route="noop", state={"noop_patch_note": _NOOP_PATCH_NOTE})
+    return Event(route="rebuild", state={"noop_patch_note": ""})
+
+
+_STEP_2_SUMMARY_RE = re.compile(r"^Step 2\s+\[MANDATORY\]\s*\|\s*(.*)$", re.MULTILINE)
+
+
+def _log_reports_step_2_pass(log_tail: str) -> bool:
+    """
+    解析构建日志尾部 VALIDATION SUMMARY 表中 Step 2 一行，结果文本以 pass 开头即视为通过。
+    🔑 失败行形如 "fail: <stderr 片段>"，片段中可能夹带 pass 字样，不能按子串判定。
+    """
+    match = _STEP_2_SUMMARY_RE.search(log_tail or "")
+    return bool(match) and match.group(1).strip().lower().startswith("pass")
+
+
 def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySessionService]:
     """
     Dynamically instantiates all agents and binds into linear Workflow.
@@ -454,7 +697,7 @@ def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySes
     # 1. 初始化所有 LlmAgent
     initial_setup_agent = LlmAgent(
         name="initial_setup_agent",
-        model=LiteLlm(model=MODEL, api_base=api_base, api_key=API_KEY, temperature=0.0, top_p=0.1, seed=LLM_SEED),
+        model=_shared_llm(temperature=0.0, top_p=0.1),
         instruction=load_instruction_from_file("instructions/initial_setup_instruction.txt"),
         tools=[
             download_github_repo,
@@ -471,23 +714,15 @@ def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySes
 
     run_fuzz_and_collect_log_agent = LlmAgent(
         name="run_fuzz_and_collect_log_agent",
-        model=LiteLlm(model=MODEL, api_base=api_base, api_key=API_KEY, temperature=0.0, top_p=0.1, seed=LLM_SEED),
+        model=_shared_llm(temperature=0.0, top_p=0.1),
         instruction=load_instruction_from_file("instructions/run_fuzz_and_collect_log_instruction.txt"),
         tools=[read_file_content, run_fuzz_build_and_validate, get_workspace_root],
         output_key="fuzz_build_log",
     )
 
-    decision_agent = LlmAgent(
-        name="decision_agent",
-        model=LiteLlm(model=MODEL, api_base=api_base, api_key=API_KEY, temperature=0.0, top_p=0.1, seed=LLM_SEED),
-        instruction=load_instruction_from_file("instructions/decision_instruction.txt"),
-        tools=[read_file_content, exit_loop],
-        output_key="decision_result",
-    )
-
     rsmc_agent = LlmAgent(
         name="rsmc_agent",
-        model=LiteLlm(model=MODEL, api_base=api_base, api_key=API_KEY, temperature=0.2, top_p=0.3, seed=LLM_SEED),
+        model=_shared_llm(temperature=0.2, top_p=0.3),
         instruction=load_instruction_from_file("instructions/rsmc_instruction.txt"),
         tools=[read_file_content, init_or_update_rsmc_ledger, query_trace_ledger],
         output_key="loop_summary",
@@ -495,7 +730,7 @@ def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySes
 
     rollback_agent = LlmAgent(
         name="rollback_agent",
-        model=LiteLlm(model=MODEL, api_base=api_base, api_key=API_KEY, temperature=0.0, top_p=0.1, seed=LLM_SEED),
+        model=_shared_llm(temperature=0.0, top_p=0.1),
         instruction=load_instruction_from_file("instructions/rollback_instruction.txt"),
         tools=[
             cbsc_classify_log,
@@ -507,7 +742,7 @@ def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySes
 
     commit_finder_agent = LlmAgent(
         name="commit_finder_agent",
-        model=LiteLlm(model=MODEL, api_base=api_base, api_key=API_KEY, temperature=0.0, top_p=0.1, seed=LLM_SEED),
+        model=_shared_llm(temperature=0.0, top_p=0.1),
         instruction=processed_instruction,
         tools=[
             read_file_content,
@@ -524,8 +759,7 @@ def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySes
 
     prompt_generate_agent = LlmAgent(
         name="prompt_generate_agent",
-        model=LiteLlm(model=MODEL, api_base=api_base, api_key=API_KEY, max_output_tokens=16384, temperature=0.2, top_p=0.3,
-                      seed=LLM_SEED),
+        model=_shared_llm(max_output_tokens=16384, temperature=0.2, top_p=0.3),
         instruction=load_instruction_from_file("instructions/prompt_generate_instruction.txt"),
         tools=[
             prompt_generate_tool,
@@ -543,16 +777,15 @@ def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySes
 
     fuzzing_solver_agent = LlmAgent(
         name="fuzzing_solver_agent",
-        model=LiteLlm(model=MODEL, api_base=api_base, api_key=API_KEY, max_output_tokens=8129, temperature=0.0, top_p=0.2,
-                      seed=LLM_SEED),
+        model=_shared_llm(max_output_tokens=8129, temperature=0.0, top_p=0.2),
         instruction=load_instruction_from_file("instructions/fuzzing_solver_instruction.txt"),
-        tools=[read_file_content, create_or_update_file,list_files_in_dir],
+        tools=[read_file_content, read_files_batch, create_or_update_file, list_files_in_dir],
         output_key="solution_plan",
     )
 
     solution_applier_agent = LlmAgent(
         name="solution_applier_agent",
-        model=LiteLlm(model=MODEL, api_base=api_base, api_key=API_KEY, temperature=0.0, top_p=0.1, seed=LLM_SEED),
+        model=_shared_llm(temperature=0.0, top_p=0.1),
         instruction=load_instruction_from_file("instructions/solution_applier_instruction.txt"),
         tools=[
             apply_patch,
@@ -564,10 +797,15 @@ def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySes
         output_key="patch_application_result",
     )
 
+    # 🔑 环境初始化快速路径：初始输入本身就是结构化 JSON，固定工具序列直接由 Python 执行，
+    # 省去一次 LLM 编排往返；解析失败或任一步骤失败时路由到 LLM 版 initial_setup_agent 兜底
+    @node(name="initial_setup_fast_path")
+    async def setup_fast_path_node(ctx: Context, node_input: Any):
+        return await _setup_fast_path(node_input)
+
     # 2. 包装节点
     setup_node = node(initial_setup_agent, name="initial_setup_agent")
     fuzz_node = node(run_fuzz_and_collect_log_agent, name="run_fuzz_and_collect_log_agent")
-    decision_node = node(decision_agent, name="decision_agent")
     rsmc_node = node(rsmc_agent, name="rsmc_agent")
     rollback_node = node(rollback_agent, name="rollback_agent")
     finder_node = node(commit_finder_agent, name="commit_finder_agent")
@@ -575,6 +813,27 @@ def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySes
     solver_node = node(fuzzing_solver_agent, name="fuzzing_solver_agent")
     applier_node = node(solution_applier_agent, name="solution_applier_agent")
 
+    # 🔑 判定节点：Step 2 是否通过只是一次字符串比较，直接读校验报告/日志尾部，不再为此发起 LLM 工具调用
+    @node(name="decision_agent")
+    async def decision_node(ctx: Context, node_input: Any):
+        is_success = _is_step_2_success(ctx.state.get("last_validation_report", {}))
+        if not is_success:
+            log_tail = ctx.state.get("fuzz_build_log_tail")
+            if not isinstance(log_tail, str):
+                log_path = FUZZ_BUILD_LOG_PATH
+                log_tail = read_file_content(log_path, mode="tail_40_lines").get("content", "") \
+                    if os.path.exists(log_path) else ""
+            is_success = _log_reports_step_2_pass(log_tail)
+
+        decision = "Build passed Step 2, exiting the repair loop." if is_success \
+            else "Build failed at Step 2, continuing with the fix."
+        print(f"--- [decision_agent] {decision} ---")
+        return Event(actions=EventActions(state_delta={"decision_result": decision}, escalate=is_success))
+
+    @node(name="rebuild_gate")
+    async def rebuild_gate_node(ctx: Context, node_input: Any):
+        return _rebuild_gate(ctx.session.events)
+
     # 3. 路由逻辑 (实现图内自动循环)
     @node(name="router_node")
     async def router_node(ctx: Context, node_input: Any):
@@ -592,7 +851,9 @@ def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySes
 
     # 4. 构建闭环图结构
     edges = [
-        ("START", setup_node),
+        ("START", setup_fast_path_node),
+        Edge(from_node=setup_fast_path_node, route="ready", to_node=fuzz_node),
+        Edge(from_node=setup_fast_path_node, route="fallback", to_node=setup_node),
         (setup_node, fuzz_node),
         (fuzz_node, decision_node),
         (decision_node, router_node),
@@ -602,7 +863,9 @@ def initialize_agents(session_state: dict = None) -> Tuple[BaseNode, InMemorySes
         (finder_node, prompt_node),
         (prompt_node, solver_node),
         (solver_node, applier_node),
-        (applier_node, fuzz_node),  # 闭环核心：补丁应用后触发重新编译
+        (applier_node, rebuild_gate_node),
+        Edge(from_node=rebuild_gate_node, route="rebuild", to_node=fuzz_node),  # 闭环核心：补丁应用后触发重新编译
+        Edge(from_node=rebuild_gate_node, route="noop", to_node=router_node),
         Edge(from_node=router_node, route="exit", to_node=success_node),
     ]
 
@@ -620,12 +883,13 @@ async def process_single_project(
         yaml_path: str,
         row_index: int
 ) -> Tuple[bool, Optional[str], Optional[str], Optional[str]]:
-    print(f"[EVIDENCE] YAML Data Audit - Root Cause Commit: '{project_info.get('root_cause_commit')}'")
-    print(f"[EVIDENCE] YAML Data Audit - Workspace: '{project_info.get('root_cause_workspace')}'")
+    # 两行审计输出合并为一次写入
+    sys.stdout.write(f"[EVIDENCE] YAML Data Audit - Root Cause Commit: '{project_info.get('root_cause_commit')}'\n"
+                     f"[EVIDENCE] YAML Data Audit - Workspace: '{project_info.get('root_cause_workspace')}'\n")
 
     project_name = project_info['project_name']
     TraceLedgerManager.set_active_project(project_name)
-    safe_name = "".join(c for c in project_name if c.isalnum() or c in ('_', '-')).rstrip()
+    safe_name = _SAFE_NAME_RE.sub('', project_name).rstrip()
     expected_source_path = os.path.join(os.getcwd(), "process", "project", safe_name)
 
     oss_fuzz_sha = project_info['sha']
@@ -651,7 +915,10 @@ async def process_single_project(
     try:
         for attempt in range(MAX_RETRIES):
 
-            cleanup_environment(project_name)
+            # 上一次尝试中止/崩溃时遗留的预清理任务先汇合并丢弃，不能被本次尝试的构建认领
+            await asyncio.to_thread(agent_tools.discard_prebuild_cleanups)
+            # 大目录删除 (oss-fuzz 等) 放入工作线程，事件循环不被阻塞
+            await asyncio.to_thread(cleanup_environment, project_name)
             current_attempt_id = attempt + 1
             processed_event_ids = set()
             ledger_abs_file = TraceLedgerManager.get_ledger_path()
@@ -681,9 +948,7 @@ async def process_single_project(
             session_service = InMemorySessionService()
             current_session_id = f"session_{project_name}_{int(time.time())}_at{attempt}"
 
-            await session_service.create_session(app_name=APP_NAME, user_id=USER_ID, session_id=current_session_id)
-            session = await session_service.get_session(app_name=APP_NAME, user_id=USER_ID,
-                                                        session_id=current_session_id)
+            session = await _create_attempt_session(session_service, current_session_id, current_attempt_id)
 
             # 预加载 root_cause 数据到 state
             session.state["root_cause_commit"] = project_info.get("root_cause_commit", "")
@@ -712,14 +977,15 @@ async def process_single_project(
                 if ledger_oss not in ("N/A", "PENDING") and disk_oss != "N/A" and ledger_oss != disk_oss:
                     print(
                         f"--- ⚠️ Integrity Mismatch [OSS-Fuzz]: Ledger={ledger_oss[:7]}, Disk={disk_oss[:7]}. Resetting... ---")
-                    subprocess.run(["git", "-C", "oss-fuzz", "reset", "--hard", ledger_oss], check=True)
-                    subprocess.run(["git", "-C", "oss-fuzz", "clean", "-fxd"], check=True)
+                    await asyncio.to_thread(subprocess.run, ["git", "-C", "oss-fuzz", "reset", "--hard", ledger_oss], check=True)
+                    await asyncio.to_thread(subprocess.run, ["git", "-C", "oss-fuzz", "clean", "-fxd"], check=True)
 
                 if ledger_prj not in ("N/A", "PENDING") and disk_prj != "N/A" and ledger_prj != disk_prj:
                     print(
                         f"--- ⚠️ Integrity Mismatch [Upstream]: Ledger={ledger_prj[:7]}, Disk={disk_prj[:7]}. Resetting... ---")
-                    subprocess.run(["git", "-C", expected_source_path, "reset", "--hard", ledger_prj], check=True)
-                    subprocess.run(["git", "-C", expected_source_path, "clean", "-fxd"], check=True)
+                    await asyncio.to_thread(subprocess.run, ["git", "-C", expected_source_path, "reset", "--hard", ledger_prj],
+                                            check=True)
+                    await asyncio.to_thread(subprocess.run, ["git", "-C", expected_source_path, "clean", "-fxd"], check=True)
 
             # 初始化会话状态
             session.state["attempt_id"] = current_attempt_id
@@ -821,6 +1087,9 @@ async def process_single_project(
 
                 # 🔑 物理加固：还原为低耦合生成器，允许安全拦截 ValueError 并在不崩溃的情况下继续执行
                 gen = runner.run_async(user_id=USER_ID, session_id=current_session_id, new_message=initial_message)
+                # 🔑 上一轮交给 applier 的 solution.txt 摘要：连续两轮方案逐字节相同即判定循环空转
+                last_solution_digest = None
+                last_event_author = None
                 while True:
                     try:
                         event = await gen.__anext__()
@@ -850,23 +1119,20 @@ async def process_single_project(
 
                     GLOBAL_LOGGER.log_event(event)
 
-                    if event.author in {'run_fuzz_and_collect_log_agent', 'decision_agent', 'rsmc_agent', 'commit_finder_agent', 'solution_applier_agent'}:
-                        func_calls = event.get_function_calls() if hasattr(event, 'get_function_calls') else []
-                        if func_calls:
-                            current_session = await session_service.get_session(
-                                app_name=APP_NAME,
-                                user_id=USER_ID,
-                                session_id=current_session_id
-                            )
-                            state = current_session.state if current_session else {}
-                            # print(
-                            #     f"[DEBUG {event.author} context] "
-                            #     f"project_name={state.get('project_name')} | "
-                            #     f"project_source_path={state.get('project_source_path')} | "
-                            #     f"project_config_path={state.get('project_config_path')} | "
-                            #     f"project_config_repo_path={state.get('project_config_repo_path')} | "
-                            #     f"basic_information={state.get('basic_information')}"
-                            # )
+                    # 🔑 applier 每轮首个事件到达时工具尚未执行：若方案与上一轮完全相同，重复应用必然重现同一失败，直接结束本次尝试
+                    if event.author == 'solution_applier_agent' and last_event_author != 'solution_applier_agent':
+                        try:
+                            with open("solution.txt", 'rb') as f:
+                                solution_digest = hashlib.sha256(f.read()).hexdigest()
+                        except OSError:
+                            solution_digest = None
+                        if solution_digest and solution_digest == last_solution_digest:
+                            print("--- ⚠️ [Orchestrator] Solver produced a solution identical to the previous round. "
+                                  "Aborting this attempt to avoid re-applying a known failing patch. ---")
+                            GLOBAL_LOGGER.log_raw("Identical solution.txt detected across consecutive rounds; attempt aborted.")
+                            break
+                        last_solution_digest = solution_digest
+                    last_event_author = event.author
 
                     # Token 计数器更新
                     if event.usage_metadata:
@@ -886,7 +1152,8 @@ async def process_single_project(
                             stats["code_gen_tokens"] += c
 
                     # 🔑 拦截 1：处理 Initial Setup 的环境配置输出
-                    if event.author == 'initial_setup_agent' and event.actions and event.actions.state_delta:
+                    if event.author in {'initial_setup_agent', 'initial_setup_fast_path'} and event.actions \
+                            and event.actions.state_delta:
                         if 'basic_information' in event.actions.state_delta:
                             full_info = event.actions.state_delta['basic_information']
                             try:
@@ -894,9 +1161,11 @@ async def process_single_project(
                                 if isinstance(full_info, dict):
                                     data = full_info
                                 elif isinstance(full_info, str):
-                                    json_match = re.search(r'(\{[\s\S]*\})', full_info)
-                                    if json_match:
-                                        data = json.loads(json_match.group(1))
+                                    # 等价于贪婪匹配首个 '{' 到最后一个 '}'：用 find/rfind 快速定位，无 JSON 片段时直接跳过解析
+                                    json_start = full_info.find('{')
+                                    json_end = full_info.rfind('}')
+                                    if json_start != -1 and json_end > json_start:
+                                        data = json.loads(full_info[json_start:json_end + 1])
 
                                 if data:
                                     session = await session_service.get_session(app_name=APP_NAME, user_id=USER_ID,
@@ -1027,48 +1296,18 @@ async def process_single_project(
                                     # 原逻辑只处理 round_id == 0，导致 Node 1、2、3 的 build_stage_after 永远为 null
                                     print(
                                         "--- [补全] Executing CBSC for current node build_stage_after backfill... ---")
-                                    classification = cbsc_classify_log()
-                                    determined_stage = classification["determined_stage"]
-
-                                    print(
-                                        f"[DBG] before backfill: round_id={session.state.get('round_id')}, current_node_id={session.state.get('current_node_id')}")
-                                    ledger_for_stage = TraceLedgerManager.load_ledger()
-                                    print(
-                                        f"[DBG] ledger last node id={ledger_for_stage['nodes'][-1]['node_id'] if ledger_for_stage.get('nodes') else 'EMPTY'}")
-                                    if ledger_for_stage.get("nodes"):
-                                        target_node_id = ledger_for_stage["nodes"][-1].get("node_id", 0)
-                                    else:
-                                        target_node_id = 0
-                                    print(
-                                        f"[DBG] target_node_id={target_node_id}, determined_stage={determined_stage}")
-
-                                    bitmap_keys = [
-                                        "step_1_official_list",
-                                        "step_2_infra_compliance",
-                                        "step_3_sanitizer_injected",
-                                        "step_4_engine_control",
-                                        "step_5_logic_linkage",
-                                        "step_6_runtime_stability"
-                                    ]
-                                    step_1_6_bitmap = [
-                                        1 if str(val_report.get(key, "")).startswith("pass") else 0
-                                        for key in bitmap_keys
-                                    ]
-
-                                    TraceLedgerManager.update_node_fields(target_node_id, {
-                                        "metrics.build_stage_after": determined_stage,
-                                        "validation.validation_report_after": val_report,
-                                        "validation.step_1_6_bitmap": step_1_6_bitmap
-                                    })
-                                    print(
-                                        f"--- [补全] Node {target_node_id} build_stage_after = {determined_stage} ---")
-
+                                    # 日志分类可能触发同步 LLM 仲裁请求：放到工作线程执行，但在此处等待完成，
+                                    # 保证后续 rsmc/HSR 读写账本前回填已落盘
+                                    classification = await asyncio.to_thread(cbsc_classify_log)
+                                    _complete_cbsc_backfill(classification, val_report, session.state)
 
                             if resp.name == 'execute_hsr_decision':
                                 if resp.response.get("action") == "ROLLBACK":
                                     session = await session_service.get_session(app_name=APP_NAME, user_id=USER_ID,
                                                                                 session_id=current_session_id)
                                     session.state["current_node_id"] = resp.response.get("target_node_id")
+                                    # 回滚后基线已变，相同方案不再必然重现失败
+                                    last_solution_digest = None
 
                             # 🔑 统计：监听专家知识匹配结果
                             if resp.name == 'few_shot_rag_retrieve':
@@ -1082,6 +1321,16 @@ async def process_single_project(
                                 attempt_last_patch_files = resp.response.get('modified_files_count', 0)
                                 attempt_last_patch_lines = resp.response.get('modified_lines_count', 0)
 
+                                # 未改变任何文件的补丁由 rebuild_gate 跳过重建，无需预清理
+                                if resp.response.get('changed_files_count') != 0:
+                                    # 🔑 补丁已落盘：下一轮构建的预清理与 applier 的快照提交/账本回填重叠执行
+                                    # 令牌取自本轮 (attempt_id, round_id)，只有同一轮次随后的构建会认领该任务
+                                    patch_session = await session_service.get_session(
+                                        app_name=APP_NAME, user_id=USER_ID, session_id=current_session_id)
+                                    agent_tools.schedule_prebuild_cleanup(
+                                        os.path.join(os.getcwd(), "oss-fuzz"), project_name,
+                                        agent_tools.prebuild_cleanup_token(patch_session.state))
+
                                 # 🔑 修正：upstream 标志监测保留在此处，但 SHA 写入移至 commit 响应后执行
                                 session = await session_service.get_session(app_name=APP_NAME, user_id=USER_ID,
                                                                             session_id=current_session_id)
@@ -1127,6 +1376,9 @@ async def process_single_project(
                         print(f"--- ❌ [TIMEOUT] Project {project_name} reached limit. ---")
                         break
 
+                # 重定向到管道/文件时 stdout 为块缓冲：每次尝试结束统一刷出一次，保证外部日志按尝试粒度及时可见
+                sys.stdout.flush()
+
                 if is_successful:
                     break
 
@@ -1139,16 +1391,20 @@ async def process_single_project(
 
             except Exception as e:
                 err_tb = traceback.format_exc()
-                print(f"\n--- ❌ [CRASH DETECTED] Attempt {current_attempt_id} failed: {str(e)} ---")
-                print(err_tb)
+                sys.stdout.write(f"\n--- ❌ [CRASH DETECTED] Attempt {current_attempt_id} failed: {str(e)} ---\n{err_tb}\n")
 
                 GLOBAL_LOGGER.log_raw(f"[CRITICAL ATTEMPT EXCEPTION]\nException: {str(e)}\nTraceback:\n{err_tb}")
-                await asyncio.sleep(1)
                 if attempt + 1 >= MAX_RETRIES:
                     break
+                # 节流下限而非固定等待：仅当本次尝试在 1 秒内即崩溃（快速失败循环）时补足剩余间隔
+                remaining = 1.0 - (time.time() - attempt_start_time)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
                 continue
 
     finally:
+        # 项目结束：汇合并清空尚未认领的预清理任务，不留给下一个项目的构建
+        await asyncio.to_thread(agent_tools.discard_prebuild_cleanups)
         # 🔑 统计：生成并输出最终修复报告（容错：即使流程中断也能执行）
         _generate_final_report(
             project_info=project_info,
@@ -1256,13 +1512,12 @@ async def main():
                 "root_cause_workspace": project_info.get('root_cause_workspace', "")
             }
 
-            print(f"\n{'=' * 60}")
-            print(f"--- Processing Project: {project_name} (Index: {row_index}) ---")
-            print(f"{'=' * 60}")
+            # 横幅三行合并为一次 print，分隔线为模块级常量
+            print(f"\n{_BANNER_RULE}\n--- Processing Project: {project_name} (Index: {row_index}) ---\n{_BANNER_RULE}")
 
             # 使用支持根写的新工具置于 Progress
             update_yaml_report(YAML_FILE, row_index, "Failure (Crashed/In_Progress)")
-            cleanup_environment(project_name)
+            await asyncio.to_thread(cleanup_environment, project_name)
 
             # 🔑 调整：匹配接收四个返回值，包含根因提取出的 SHA 和 workspace
             is_successful, project_config_path, final_sha, final_workspace = await process_single_project(
@@ -1286,7 +1541,8 @@ async def main():
             if update_result['status'] == 'error':
                 print(f"--- [CRITICAL] Could not update YAML report: {update_result['message']} ---")
 
-            cleanup_environment(project_name)
+            # 与项目开始时一致：删除整棵 oss-fuzz 树等清理放到工作线程，不阻塞事件循环上仍在收尾的后台任务
+            await asyncio.to_thread(cleanup_environment, project_name)
         except Exception as e:
             print(f"--- [CRITICAL] Project {project_name} failed with error: {e} ---")
             continue
@@ -1314,8 +1570,16 @@ if __name__ == "__main__":
             print("✅ GitHub CLI ('gh') is logged in.")
             print("\n--- Checks complete. Preparing to start the Agent... ---")
 
-            # 🔑 物理执行标准异步事件循环，并在内部启动主程序
-            asyncio.run(main())
+            # 🔑 物理执行异步事件循环，并在内部启动主程序：已安装 uvloop (requirements.txt) 时使用其 libuv 事件循环，否则回退标准 asyncio
+            try:
+                import uvloop
+            except ImportError:
+                uvloop = None
+            if uvloop is not None:
+                print("✅ Using uvloop event loop.")
+                uvloop.run(main())
+            else:
+                asyncio.run(main())
 
         except (FileNotFoundError, subprocess.CalledProcessError) as e:
             print("\n[ERROR] Startup failed: GitHub CLI ('gh') is not installed or not logged in.")
@@ -10,6 +10,9 @@ import tempfile
 import fnmatch
 import logging
 import textwrap
+from bisect import bisect_left
+from functools import lru_cache
+from operator import itemgetter
 from datetime import datetime, timedelta, timezone
 from typing import Dict, List, Tuple, Callable, Optional, Set, Any
 from google.adk.tools.tool_context import ToolContext
@@ -37,6 +40,19 @@ GLOBAL_CHAR_BUDGET = 280000  # 硬编码
 max_lines = 2500  # 硬编码
 _LATEST_BASIC_INFORMATION: Dict[str, Any] = {}
 
+# License/Header 注释行前缀（read_file_content 剥离文件头用）
+_LICENSE_HEADER_PREFIXES = ('#', '//', '*', '/*')
+
+# 历史报错日志命名规范：YYYY_M_D error.txt
+_LOG_FILENAME_RE = re.compile(r"(\d{4})_(\d{1,2})_(\d{1,2}) error\.txt")
+
+# 构建日志故障行特征：一次编译的忽略大小写交替正则，替代逐关键词 `in` 扫描与逐行 lower() 复制
+_FAILURE_LINE_RE = re.compile(r"error:|cannot |fail|undefined reference", re.IGNORECASE)
+_WARNING_LINE_RE = re.compile(r"warning:|exit status", re.IGNORECASE)
+
+# 项目名安全化：\w 即 isalnum() 或下划线，整段非法字符一次在正则引擎中剔除
+_SAFE_NAME_RE = re.compile(r"[^\w-]+")
+
 
 def extract_basic_information(raw_basic_information: Any) -> Dict[str, Any]:
     """
@@ -117,7 +133,7 @@ class TraceLedgerManager:
 
     @classmethod
     def set_active_project(cls, project_name: str):
-        cls._active_project = "".join(c for c in project_name if c.isalnum() or c in ('_', '-')).rstrip()
+        cls._active_project = _SAFE_NAME_RE.sub('', project_name).rstrip()
 
     @classmethod
     def get_ledger_path(cls) -> str:
@@ -363,7 +379,8 @@ def reclaim_path_permissions(path: str) -> bool:
     if not docker_ok:
         try:
             # 强行赋予当前宿主机用户读、写、执行权限
-            subprocess.run(["chmod", "-R", "u+rwX", abs_path], capture_output=True, check=False)
+            subprocess.run(["chmod", "-R", "u+rwX", abs_path],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
         except Exception:
             pass
 
@@ -527,7 +544,9 @@ def get_verified_git_sha(repo_path: str, retries: int = 3) -> str:
             manage_git_state(repo_path, "init")
 
         print(f"--- [Audit] SHA invalid at {repo_path}, retrying... ({i + 1}/{retries}) ---")
-        time.sleep(1)
+        # 最后一次失败后直接返回，不再空等
+        if i + 1 < retries:
+            time.sleep(1)
 
     print(f"--- [Audit] CRITICAL: SHA invalid after {retries} retries in {repo_path} ---")
     return "N/A"
@@ -598,46 +617,64 @@ def apply_patch(solution_file_path: str, **kwargs) -> dict:
         return {"status": "error", "message": "Solution file not found."}
     try:
         with open(solution_file_path, 'r', encoding='utf-8') as f:
+            _advise_sequential(f.fileno())
             content = f.read()
         patch_blocks = content.split('---=== FILE ===---')[1:]
         applied_count = 0
         errors = []
-
+        # 🔑 同一次调用内多个补丁块可能指向同一文件：缓存文件内容、空白归一化结果与行索引，写回时同步失效
+        content_cache: Dict[str, str] = {}
+        # 首次读取时的原始内容：用于判定补丁是否真正改变了文件
+        original_contents: Dict[str, str] = {}
+        norm_cache: Dict[str, str] = {}
+        line_index_cache: Dict[str, Tuple[List[str], Dict[str, int]]] = {}
+        # 🔑 修改先暂存于内存，全部补丁块成功后才统一原子落盘，避免部分应用导致工作区与账本失步
+        dirty_files: Set[str] = set()
+
+        def _store(path: str, new_text: str):
+            content_cache[path] = new_text
+            dirty_files.add(path)
+            norm_cache.pop(path, None)
+            line_index_cache.pop(path, None)
+
+        # 首遍统一解析所有补丁块 (target, original, replacement)，后续应用与行数统计复用同一结果
+        parsed_blocks: List[Tuple[str, str, str]] = []
         for block in patch_blocks:
             parts = block.split('---=== ORIGINAL ===---')
-            original_target = parts[0].strip()
             content_parts = parts[1].split('---=== REPLACEMENT ===---')
-            original_block = content_parts[0].strip("\n\r")
-            replacement_block = content_parts[1].strip("\n\r")
+            parsed_blocks.append((parts[0].strip(), content_parts[0].strip("\n\r"), content_parts[1].strip("\n\r")))
 
+        for original_target, original_block, replacement_block in parsed_blocks:
             file_path = os.path.normpath(os.path.join(base_dir, original_target)) if not os.path.isabs(
                 original_target) else original_target
             if not os.path.exists(file_path):
                 errors.append(f"File not found: {original_target}")
                 continue
 
-            with open(file_path, 'r', encoding='utf-8') as f:
-                file_content = f.read()
+            if file_path not in content_cache:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content_cache[file_path] = original_contents[file_path] = f.read()
+            file_content = content_cache[file_path]
 
             if replacement_block in file_content:
                 applied_count += 1
                 continue
 
+            if file_path not in norm_cache:
+                norm_cache[file_path] = re.sub(r'\s+', ' ', file_content).strip()
+            norm_file = norm_cache[file_path]
+
             norm_repl = re.sub(r'\s+', ' ', replacement_block).strip()
-            norm_file = re.sub(r'\s+', ' ', file_content).strip()
             if norm_repl in norm_file:
                 applied_count += 1
                 continue
 
             if original_block in file_content:
-                new_content = file_content.replace(original_block, replacement_block, 1)
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(new_content)
+                _store(file_path, file_content.replace(original_block, replacement_block, 1))
                 applied_count += 1
                 continue
 
             norm_orig = re.sub(r'\s+', ' ', original_block).strip()
-            norm_file = re.sub(r'\s+', ' ', file_content).strip()
             if norm_orig in norm_file:
                 file_lines = file_content.splitlines()
                 orig_lines = original_block.splitlines()
@@ -651,43 +688,62 @@ def apply_patch(solution_file_path: str, **kwargs) -> dict:
                     new_lines = file_lines[:matched_idx] + replacement_block.splitlines() + file_lines[
                         matched_idx + len(
                             orig_lines):]
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write("\n".join(new_lines))
+                    _store(file_path, "\n".join(new_lines))
                     applied_count += 1
                     continue
 
-            lines = file_content.splitlines()
+            # 匹配失败：基于 (去空白行 -> 首次出现行号) 索引定位锚点，精确命中 O(1)，否则仅在去重后的行集合上做近似匹配
+            if file_path not in line_index_cache:
+                lines = file_content.splitlines()
+                line_idx: Dict[str, int] = {}
+                for i, line in enumerate(lines):
+                    line_idx.setdefault(line.strip(), i)
+                line_index_cache[file_path] = (lines, line_idx)
+            lines, line_idx = line_index_cache[file_path]
+
             search_anchor = original_block.splitlines()[0].strip()
-            matches = difflib.get_close_matches(search_anchor, lines, n=1, cutoff=0.3)
+            idx = line_idx.get(search_anchor)
+            if idx is None:
+                matches = difflib.get_close_matches(search_anchor, line_idx.keys(), n=1, cutoff=0.3)
+                idx = line_idx[matches[0]] if matches else None
             ctx = "Unknown context"
-            if matches:
-                idx = lines.index(matches[0])
+            if idx is not None:
                 ctx = "\n".join(lines[max(0, idx - 5):min(len(lines), idx + 10)])
             errors.append(f"MATCH FAILED for {original_target}.\n### ACTUAL CONTENT AROUND TARGET AREA ###\n{ctx}")
 
-            # 统计所有块的增删行数（在 for block 循环结束后执行）
-        total_lines_changed = 0
-        for stat_block in patch_blocks:
-            stat_parts = stat_block.split('---=== ORIGINAL ===---')
-            if len(stat_parts) < 2:
-                continue
-            stat_content_parts = stat_parts[1].split('---=== REPLACEMENT ===---')
-            if len(stat_content_parts) < 2:
-                continue
-            orig_line_count = len(stat_content_parts[0].strip("\n\r").splitlines())
-            repl_line_count = len(stat_content_parts[1].strip("\n\r").splitlines())
-            total_lines_changed += max(orig_line_count, repl_line_count)
+        # 仅内容确实变化的文件需要落盘；未变化的文件不重写，也不会改动 mtime
+        changed_files = sorted(p for p in dirty_files if content_cache[p] != original_contents[p])
+        if errors:
+            # 任一补丁块失败则整体放弃写入，工作区保持原样
+            applied_count = 0
+            changed_files = []
+        else:
+            _atomic_write_many({p: content_cache[p] for p in changed_files})
+
+        # 统计所有块的增删行数
+        total_lines_changed = sum(
+            max(len(original_block.splitlines()), len(replacement_block.splitlines()))
+            for _, original_block, replacement_block in parsed_blocks
+        )
 
         return {
             "status": "success" if not errors else "error",
             "modified_files_count": applied_count,
             "modified_lines_count": total_lines_changed,
+            "changed_files_count": len(changed_files),
+            "changed_files": changed_files,
             "errors": errors
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+_AGENT_GIT_EMAIL = "agent@oss-fuzz-repair.com"
+_AGENT_GIT_NAME = "Repair Agent"
+# 大仓库传输参数：以 -c 形式随 clone 下发，不再每次调用 git config --global 写全局配置
+_GIT_HTTP_OPTS = ["-c", "http.postBuffer=524288000", "-c", "http.lowSpeedLimit=0", "-c", "http.lowSpeedTime=999999"]
+
+
 def manage_git_state(path: str, action: str, message: str = "", commit_sha: str = "") -> Dict:
     """
     Manages the Git state tree with logical fencing and physical auditing.
@@ -716,12 +772,15 @@ def manage_git_state(path: str, action: str, message: str = "", commit_sha: str
 
         os.chdir(abs_path)
 
-        # 2. 基础配置初始化
+        # 2. 基础配置初始化：身份写入仓库配置仅在 init 或新建仓库时执行一次，
+        # 已有仓库的 commit 分支通过 -c 注入身份，免去每次保存两次 git config 子进程
         if action in ["init", "commit"]:
-            if not os.path.exists(".git"):
+            fresh_repo = not os.path.exists(".git")
+            if fresh_repo:
                 subprocess.run(["git", "init"], check=True, capture_output=True)
-            subprocess.run(["git", "config", "user.email", "agent@oss-fuzz-repair.com"], check=True)
-            subprocess.run(["git", "config", "user.name", "Repair Agent"], check=True)
+            if action == "init" or fresh_repo:
+                subprocess.run(["git", "config", "user.email", _AGENT_GIT_EMAIL], check=True)
+                subprocess.run(["git", "config", "user.name", _AGENT_GIT_NAME], check=True)
 
         # 3. 分支逻辑处理
         if action == "init":
@@ -737,9 +796,17 @@ def manage_git_state(path: str, action: str, message: str = "", commit_sha: str
         elif action == "commit":
             subprocess.run(["git", "add", "."], check=True)
             full_message = f"[AGENT_FIX] {message}"
-            subprocess.run(["git", "commit", "--allow-empty", "-m", full_message], capture_output=True, text=True, check=True)
+            # 🔑 仅凭退出码判断暂存区是否有改动（0 = 无改动，1 = 有改动），不解析任何输出；
+            # 双工作区快照契约要求每次保存都产生新 SHA，因此无改动时显式以 --allow-empty 提交空快照
+            has_changes = subprocess.run(["git", "diff", "--cached", "--quiet"]).returncode == 1
+            commit_cmd = ["git", "-c", f"user.email={_AGENT_GIT_EMAIL}", "-c", f"user.name={_AGENT_GIT_NAME}",
+                          "commit", "-m", full_message]
+            if not has_changes:
+                commit_cmd.insert(-2, "--allow-empty")
+            subprocess.run(commit_cmd, capture_output=True, text=True, check=True)
             sha = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
-            return {"status": "success", "sha": sha, "message": f"State saved: {full_message}"}
+            return {"status": "success", "sha": sha, "has_changes": has_changes,
+                    "message": f"State saved: {full_message}" + ("" if has_changes else " (empty snapshot)")}
 
         elif action == "rollback":
             # 统计带有 [AGENT_FIX] 标记的提交数量作为配额
@@ -754,7 +821,7 @@ def manage_git_state(path: str, action: str, message: str = "", commit_sha: str
 
             target = commit_sha if commit_sha else "HEAD~1"
             subprocess.run(["git", "reset", "--hard", target], check=True, capture_output=True)
-            subprocess.run(["git", "clean", "-fxd"], check=True, capture_output=True)
+            subprocess.run(["git", "clean", "-fxd"], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
             return {"status": "success", "message": f"Rolled back to {target}. Remaining Fixes: {quota - 1}"}
 
         elif action == "status":
@@ -842,6 +909,15 @@ def commit_workspace_snapshots(project_source_path: str, project_config_path: st
 
 # run_fuzz_and_collect_log_agent tools
 
+# 构建日志目录与文件（相对工作区根目录）：模块加载时拼接一次，各工具与编排器共用
+FUZZ_BUILD_LOG_DIR = "fuzz_build_log_file"
+FUZZ_BUILD_LOG_PATH = os.path.join(FUZZ_BUILD_LOG_DIR, "fuzz_build_log.txt")
+
+# 校验摘要表的固定页眉/页脚：模块加载时构造一次
+_SUMMARY_TABLE_HEADER = "\n" + "=" * 50 + "\n--- VALIDATION SUMMARY\n" + "-" * 50 + "\n"
+_SUMMARY_TABLE_FOOTER = "=" * 50 + "\n"
+
+
 def run_fuzz_build_and_validate(
         project_name: str,
         oss_fuzz_path: str,
@@ -866,6 +942,8 @@ def run_fuzz_build_and_validate(
     import signal
     import select  # 用于非阻塞读取
     import re  # 用于进度正则匹配
+    import io
+    import codecs
 
     raw_basic_information = None
     if tool_context and getattr(tool_context, "session", None):
@@ -893,11 +971,17 @@ def run_fuzz_build_and_validate(
         f"mount_path={mount_path}"
     )
 
-    _cleanup_environment(oss_fuzz_path, project_name)
-    print(f"[*] Comprehensive Pre-build cleanup completed.")
+    cleanup_token = prebuild_cleanup_token(tool_context.session.state) \
+        if tool_context and getattr(tool_context, "session", None) else None
+    if _await_prebuild_cleanup(oss_fuzz_path, project_name, cleanup_token):
+        print("[*] Comprehensive Pre-build cleanup completed (overlapped with patch sealing).")
+    else:
+        _cleanup_environment(oss_fuzz_path, project_name)
+        print(f"[*] Comprehensive Pre-build cleanup completed.")
 
-    LOG_DIR = "fuzz_build_log_file"
-    LOG_FILE_PATH = os.path.join(LOG_DIR, "fuzz_build_log.txt")
+    LOG_DIR = FUZZ_BUILD_LOG_DIR
+    LOG_FILE_PATH = FUZZ_BUILD_LOG_PATH
+    LOG_TAIL_CHARS = 12000  # 随会话状态下发的日志尾部长度
     os.makedirs(LOG_DIR, exist_ok=True)
 
     report = {
@@ -910,18 +994,28 @@ def run_fuzz_build_and_validate(
     }
 
     def build_summary_table() -> str:
-        summary = "\n" + "=" * 50 + "\n--- VALIDATION SUMMARY\n" + "-" * 50 + "\n"
+        rows = [_SUMMARY_TABLE_HEADER]
         for i, (k, v) in enumerate(report.items(), 1):
             marker = "[MANDATORY]" if i == 2 else "[REFERENCE]"
-            summary += f"Step {i:<4} {marker:<12} | {v}\n"
-        summary += "=" * 50 + "\n"
-        return summary
+            rows.append(f"Step {i:<4} {marker:<12} | {v}\n")
+        rows.append(_SUMMARY_TABLE_FOOTER)
+        return "".join(rows)
 
-    def write_log_artifact(base_log: str, result_line: str) -> None:
-        with open(LOG_FILE_PATH, "w", encoding="utf-8") as f:
-            f.write(base_log)
-            f.write(build_summary_table())
-            f.write(f"\n{result_line}")
+    def write_log_artifact(base_log: str, result_line: str, streamed: bool = False) -> None:
+        """
+        streamed=True 表示构建输出已在编译阶段流式写入日志文件，base_log 仅为其保留尾部，
+        此时只追加校验摘要与结果行；否则以 base_log 整体覆盖日志文件。
+        """
+        trailer = f"{build_summary_table()}\n{result_line}"
+        with open(LOG_FILE_PATH, "a" if streamed else "w", encoding="utf-8") as f:
+            if not streamed:
+                f.write(base_log)
+            f.write(trailer)
+        # 🔑 日志尾部直接随会话状态下发给 prompt_generate_tool，省去一次回读磁盘日志；
+        # 校验报告同样写入工作流会话，decision_agent/router_node 据此判定 Step 2
+        if tool_context and getattr(tool_context, "session", None):
+            tool_context.session.state["fuzz_build_log_tail"] = (base_log + trailer)[-LOG_TAIL_CHARS:]
+            tool_context.session.state["last_validation_report"] = dict(report)
 
     # =========================================================================
     # 内部辅助过滤函数（对应 test_all.py 中的合法 Fuzzer 识别逻辑）
@@ -967,8 +1061,13 @@ def run_fuzz_build_and_validate(
 
         executable_mask = stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH
 
-        for filename in os.listdir(directory):
-            path = os.path.join(directory, filename)
+        # scandir 一次读目录：DirEntry 自带文件类型并缓存 stat 结果，省去逐项 isfile + stat 的重复系统调用
+        with os.scandir(directory) as it:
+            dir_entries = list(it)
+
+        for entry in dir_entries:
+            filename = entry.name
+            path = entry.path
 
             # ---- 第一层过滤：物理属性过滤 (Structural Filter) ----
             # 1. 排除特定辅助工具与非 Fuzzer 产物
@@ -982,12 +1081,15 @@ def run_fuzz_build_and_validate(
                 continue
 
             # 2. 必须是文件
-            if not os.path.isfile(path):
+            try:
+                if not entry.is_file():
+                    continue
+            except OSError:
                 continue
 
             # 3. 必须具备可执行权限
             try:
-                if not (os.stat(path).st_mode & executable_mask):
+                if not (entry.stat().st_mode & executable_mask):
                     continue
             except Exception:
                 continue
@@ -1023,38 +1125,59 @@ def run_fuzz_build_and_validate(
         build_start = time.time()
         build_timeout = 5400  # 构建超时上限设定为 90 分钟（5400 秒），不影响正常构建结束
 
+        # 🔑 二进制无缓冲管道 + 64KiB 块读取：按块而非按行解码/打印，摊薄 syscall 与逐行 flush 开销
+        # 独立进程组：超时时可整组终止 helper.py 及其拉起的 docker 子进程
         process = subprocess.Popen(
             build_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-            text=True, bufsize=1, cwd=oss_fuzz_path
+            bufsize=0, cwd=oss_fuzz_path, start_new_session=True
         )
-        full_log = []
+        # 🔑 构建输出边读边写入日志文件，内存中只保留定长尾部，峰值内存与构建日志总量无关
+        build_tail = ""
+        stdout_fd = process.stdout.fileno()
+        # 非阻塞读 + 放大管道缓冲 (Linux F_SETPIPE_SZ，默认 64KiB -> 1MiB)：日志落盘/打印偶有停顿时构建进程不被写端阻塞
+        os.set_blocking(stdout_fd, False)
+        try:
+            import fcntl
+            fcntl.fcntl(stdout_fd, getattr(fcntl, "F_SETPIPE_SZ", 1031), 1 << 20)
+        except (ImportError, OSError):
+            pass
+        # 增量解码器处理跨块截断的多字节字符；换行统一转换为 \n，与原 text=True 语义一致
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(errors="replace"), translate=True)
 
         try:
-            while True:
-                if time.time() - build_start > build_timeout:
-                    raise subprocess.TimeoutExpired(build_cmd, build_timeout)
-                line = process.stdout.readline()
-                if not line:
-                    if process.poll() is not None:
+            with open(LOG_FILE_PATH, "w", encoding="utf-8") as log_f:
+                while True:
+                    remaining = build_timeout - (time.time() - build_start)
+                    if remaining <= 0:
+                        raise subprocess.TimeoutExpired(build_cmd, build_timeout)
+                    rlist, _, _ = select.select([stdout_fd], [], [], min(remaining, 1.0))
+                    if not rlist:
+                        continue
+                    try:
+                        chunk = os.read(stdout_fd, 1 << 16)
+                    except BlockingIOError:
+                        continue
+                    text_chunk = decoder.decode(chunk, final=not chunk)
+                    if text_chunk:
+                        if verbose_build:
+                            print(text_chunk, end='', flush=True)
+                        log_f.write(text_chunk)
+                        build_tail = (build_tail + text_chunk)[-LOG_TAIL_CHARS:]
+                    if not chunk:
                         break
-                    time.sleep(0.05)
-                    continue
-                if verbose_build:
-                    print(line, end='', flush=True)
-                full_log.append(line)
-            process.wait(timeout=15)
+            process.wait(timeout=max(15.0, build_timeout - (time.time() - build_start)))
         except subprocess.TimeoutExpired:
-            process.kill()
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except Exception:
+                process.kill()
             process.wait()
-            final_log = "".join(full_log) + f"\n\nRESULT: failed (compilation timeout after {build_timeout}s)"
-            write_log_artifact("".join(full_log), f"RESULT: failed (compilation timeout after {build_timeout}s)")
+            write_log_artifact(build_tail, f"RESULT: failed (compilation timeout after {build_timeout}s)", streamed=True)
             return {"status": "error", "message": "Compilation timed out", "validation_report": report}
 
-        final_log = "".join(full_log)
-
         # 编译失败检测：仅依据构建进程退出码判定，避免日志关键词误伤后续 Step 2 成功场景
         if process.returncode != 0:
-            write_log_artifact(final_log, "RESULT: failed (compilation error)")
+            write_log_artifact(build_tail, "RESULT: failed (compilation error)", streamed=True)
             return {"status": "error", "message": "Compilation failed", "validation_report": report}
 
         # --- Phase 2: Deep Validation ---
@@ -1101,8 +1224,9 @@ def run_fuzz_build_and_validate(
             "--architecture", architecture
         ]
         try:
-            check_res = subprocess.run(check_cmd, capture_output=True, text=True, timeout=min(300, rem_t),
-                                       cwd=oss_fuzz_path)
+            # 仅 returncode 与 stderr 参与判定：stdout（docker 输出）直接丢弃，不在内存中整体缓冲
+            check_res = subprocess.run(check_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                                       timeout=min(300, rem_t), cwd=oss_fuzz_path)
             report[
                 "step_2_infra_compliance"] = "pass" if check_res.returncode == 0 else f"fail: {check_res.stderr.strip()[:200]}"
         except subprocess.TimeoutExpired:
@@ -1280,7 +1404,7 @@ def run_fuzz_build_and_validate(
         print(summary_table)
 
         # 写入物理日志
-        write_log_artifact(final_log, f"RESULT: {'success' if is_success else 'failed'}")
+        write_log_artifact(build_tail, f"RESULT: {'success' if is_success else 'failed'}", streamed=True)
 
         return {
             "status": "success" if is_success else "error",
@@ -1309,7 +1433,7 @@ def cbsc_classify_log(log_path: str = None, dpseek_key: str = None) -> dict:
     Phase 3 LLM Arbitration under ambiguous or silent exit scenarios.
     """
     # 日志路径优先级：实时构建日志 > 历史错误日志 > 默认实时日志
-    real_time_log = "fuzz_build_log_file/fuzz_build_log.txt"
+    real_time_log = FUZZ_BUILD_LOG_PATH
     if os.path.exists(real_time_log):
         log_path = real_time_log
     elif _is_initial_round():
@@ -1340,8 +1464,7 @@ def cbsc_classify_log(log_path: str = None, dpseek_key: str = None) -> dict:
 
     # 读取日志并剔除 1+2+6 验证审计总结干扰
     try:
-        with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-            raw_log = f.read()
+        raw_log = _read_log_capped(log_path)
     except Exception as e:
         return {
             "determined_stage": "L1",
@@ -1539,7 +1662,7 @@ def execute_hsr_decision(tool_context: ToolContext) -> dict:
     print(f"[DEBUG HSR raw basic_information] {session.state.get('basic_information')}")
     basic_info = extract_basic_information(session.state.get("basic_information") or _LATEST_BASIC_INFORMATION)
     project_name = basic_info.get("project_name") or session.state.get("project_name") or session.state.get("project") or ledger.get("project_name") or "UNKNOWN"
-    safe_name = "".join(c for c in project_name if c.isalnum() or c in ('_', '-')).rstrip()
+    safe_name = _SAFE_NAME_RE.sub('', project_name).rstrip()
 
     default_source_path = os.path.join(os.getcwd(), "process", "project", safe_name) if safe_name else None
     default_config_path = os.path.join(os.getcwd(), "oss-fuzz", "projects", safe_name) if safe_name else None
@@ -1719,7 +1842,8 @@ def execute_hsr_decision(tool_context: ToolContext) -> dict:
                 reclaim_path_permissions(repo_path)
 
                 subprocess.run(["git", "-C", repo_path, "reset", "--hard", target_sha], check=True, capture_output=True)
-                subprocess.run(["git", "-C", repo_path, "clean", "-fxd"], check=True, capture_output=True)
+                subprocess.run(["git", "-C", repo_path, "clean", "-fxd"], check=True,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
             else:
                 print(f"--- [HSR Warning] repo_path does not exist on disk: {repo_path}. Skipping this reset target. ---")
 
@@ -2193,8 +2317,10 @@ def checkout_project_commit(project_source_path: str, sha: str) -> Dict[str, str
 
     try:
         # 1. 预清理：强制放弃任何本地残留修改，确保切换环境绝对干净
-        subprocess.run(["git", "reset", "--hard", "HEAD"], capture_output=True, cwd=project_source_path)
-        subprocess.run(["git", "clean", "-fdx"], capture_output=True, cwd=project_source_path)
+        subprocess.run(["git", "reset", "--hard", "HEAD"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=project_source_path)
+        subprocess.run(["git", "clean", "-fdx"],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=project_source_path)
 
         # 2. 尝试执行物理切换
         command = ["git", "checkout", sha]
@@ -2218,7 +2344,8 @@ def checkout_project_commit(project_source_path: str, sha: str) -> Dict[str, str
                 else:
                     # 如果精准 fetch 失败，尝试全量 unshallow (针对部分浅克隆仓库)
                     print(f"--- [SELF-HEALING] Precise fetch failed. Attempting unshallow fetch... ---")
-                    subprocess.run(["git", "fetch", "--unshallow"], capture_output=True, cwd=project_source_path)
+                    subprocess.run(["git", "fetch", "--unshallow"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=project_source_path)
                     result = subprocess.run(["git", "checkout", sha], capture_output=True, text=True,
                                             cwd=project_source_path)
 
@@ -2324,13 +2451,14 @@ def update_reflection_journal(
     """
     import os
     import json
+    from collections import deque
     from datetime import datetime
 
     if not os.environ.get("ENABLE_REFLECTION", "True") == "True":
         return {"status": "success", "trigger_rollback": False}
 
     print(f"--- Tool: update_reflection_journal (v5) for A{attempt_id}_R{round_id} ---")
-    JOURNAL_FILE = "reflection_journal.json"
+    JOURNAL_FILE = "reflection_journal.jsonl"
 
     new_entry = {
         "attempt_id": attempt_id,
@@ -2344,19 +2472,23 @@ def update_reflection_journal(
         "should_rollback": should_rollback
     }
 
-    history = []
+    # 🔑 JSONL 逐行解析：单行损坏只跳过该行，不再整体丢弃历史；仅保留当前 Attempt 最近 3 条
+    current_attempt_history = deque(maxlen=3)
     if os.path.exists(JOURNAL_FILE):
-        try:
-            with open(JOURNAL_FILE, 'r', encoding='utf-8') as f:
-                history = json.load(f)
-        except:
-            pass
-    history.append(new_entry)
+        with open(JOURNAL_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(entry, dict) and entry.get('attempt_id') == attempt_id:
+                    current_attempt_history.append(entry)
+    current_attempt_history.append(new_entry)
 
-    with open(JOURNAL_FILE, 'w', encoding='utf-8') as f:
-        json.dump(history, f, indent=2, ensure_ascii=False)
+    # 追加写入单行，避免每轮重写整个日志文件
+    with open(JOURNAL_FILE, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(new_entry, ensure_ascii=False) + "\n")
 
-    current_attempt_history = [h for h in history if h['attempt_id'] == attempt_id]
     consecutive_high_score = False
     if len(current_attempt_history) >= 2:
         if current_attempt_history[-1].get("deterioration_score", 0) > 7 and \
@@ -2364,7 +2496,7 @@ def update_reflection_journal(
             consecutive_high_score = True
 
     lessons = []
-    for h in current_attempt_history[-3:]:
+    for h in current_attempt_history:
         lessons.append(
             f"A{h['attempt_id']}_R{h['round_id']} (Score:{h['deterioration_score']}):\n"
             f"  [Fixed]: {h['solved']}\n"
@@ -2381,6 +2513,137 @@ def update_reflection_journal(
 
 
 
+def _advise_sequential(fd: int, offset: int = 0) -> None:
+    """提示内核从 offset 起顺序读取（扩大预读窗口）；无 posix_fadvise 的平台或调用失败时静默忽略。"""
+    fadvise = getattr(os, "posix_fadvise", None)
+    if fadvise is None:
+        return
+    try:
+        fadvise(fd, offset, 0, os.POSIX_FADV_SEQUENTIAL)
+    except OSError:
+        pass
+
+
+def _read_tail_lines(file_path: str, n: int, max_bytes: Optional[int] = None) -> str:
+    """
+    通过 mmap 从文件末尾反向定位最后 n 行，仅解码尾部切片，避免整份大日志读入内存。
+    max_bytes 给定时切片至多取末尾 max_bytes 字节（超长行场景下丢弃起点处不完整的行）。
+    """
+    import mmap
+
+    if os.path.getsize(file_path) == 0:
+        return ""
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        end = len(mm)
+        floor = max(0, end - max_bytes) if max_bytes else 0
+        # 末尾换行不计入行数，与 readlines()[-n:] 保持一致
+        pos = end - 1 if mm[end - 1:end] == b"\n" else end
+        for _ in range(n):
+            pos = mm.rfind(b"\n", floor, pos)
+            if pos == -1:
+                if floor:
+                    # 字节上限内不足 n 行：从窗口内第一个完整行开始
+                    first_nl = mm.find(b"\n", floor, end)
+                    pos = first_nl if first_nl != -1 else floor - 1
+                break
+        return mm[pos + 1:end].decode('utf-8', errors='ignore')
+
+
+def _read_tail_chars(file_path: str, n_chars: int) -> str:
+    """
+    从文件末尾回退至多 4*n_chars 字节（UTF-8 单字符最长 4 字节）后再解码，等价于 read()[-n_chars:] 但不读取整份文件。
+    """
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        size = os.fstat(f.fileno()).st_size
+        # 文本模式下 seek 的 cookie 对无状态 UTF-8 解码器即字节偏移；起点落在多字节字符中间时由 errors='ignore' 丢弃残片
+        f.seek(max(0, size - 4 * n_chars - 4))
+        return f.read()[-n_chars:]
+
+
+# 日志去重时的地址归一化：同一报错仅十六进制地址/偏移不同的相邻行视为重复
+_HEX_ADDR_RE = re.compile(r"0x[0-9a-fA-F]+")
+
+
+def _collapse_repeated_lines(text: str) -> str:
+    """
+    将连续重复（地址归一化后相同）的日志行折叠为 `<首行> (×N)`（连续空行仅保留一行），保持行序不变；
+    构建日志中成片的 warning / undefined reference 只保留一份，降低下游 LLM 输入 Token。
+    """
+    out: List[str] = []
+    prev_line, prev_key, count = None, None, 0
+    for line in text.split("\n"):
+        key = _HEX_ADDR_RE.sub("0xADDR", line)
+        if key == prev_key:
+            count += 1
+            continue
+        if prev_line is not None:
+            out.append(f"{prev_line} (×{count})" if count > 1 and prev_line.strip() else prev_line)
+        prev_line, prev_key, count = line, key, 1
+    if prev_line is not None:
+        out.append(f"{prev_line} (×{count})" if count > 1 and prev_line.strip() else prev_line)
+    return "\n".join(out)
+
+
+# 提示词生成侧（RAG 兜底特征源）使用的构建日志尾部字节上限：下游 LLM 上下文有限，更早的输出不会被利用
+_PROMPT_LOG_TAIL_BYTES = 200_000
+
+# 构建日志分析的读取上限：故障特征集中在日志尾部，超大日志（sanitizer 追踪、fuzzer 输出）只扫描末尾这一段
+_BUILD_LOG_SCAN_CAP = 16 << 20
+
+
+def _read_log_capped(file_path: str, max_bytes: int = _BUILD_LOG_SCAN_CAP) -> str:
+    """
+    先 stat 文件大小：不超过 max_bytes 时整份读取；否则只读取末尾 max_bytes 字节，并丢弃起点处不完整的首行。
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        start = size - max_bytes if size > max_bytes else 0
+        _advise_sequential(f.fileno(), start)
+        if start:
+            f.seek(start)
+            f.readline()
+        return f.read().decode('utf-8', errors='ignore')
+
+
+# 专家知识库缓存：path -> (mtime, kb, [(err, pattern_re, exclude_re), ...])
+_EXPERT_KB_CACHE: Dict[str, Tuple[float, dict, list]] = {}
+
+# RAG 检索结果缓存：(知识库路径, 知识库 mtime, SHA-256(失败片段)) -> 检索结果；按插入顺序淘汰，上限 _RAG_RESULT_CACHE_MAX
+_RAG_RESULT_CACHE: Dict[Tuple[str, float, str], dict] = {}
+_RAG_RESULT_CACHE_MAX = 64
+
+
+def _load_expert_kb(expert_knowledge_path: str) -> Tuple[dict, list]:
+    """
+    按文件 mtime 缓存知识库及其预编译的 (IGNORECASE) 正/负向正则，知识库未变时不重复解析与编译。
+    """
+    mtime = os.path.getmtime(expert_knowledge_path)
+    cached = _EXPERT_KB_CACHE.get(expert_knowledge_path)
+    if cached and cached[0] == mtime:
+        return cached[1], cached[2]
+
+    with open(expert_knowledge_path, 'r', encoding='utf-8') as f:
+        kb = json.load(f)
+
+    compiled = []
+    for err in kb.get("error_patterns", []):
+        pattern = err.get("pattern")
+        if not pattern:
+            continue
+        try:
+            exclude_pattern = err.get("exclude_pattern")
+            compiled.append((
+                err,
+                re.compile(pattern, re.IGNORECASE),
+                re.compile(exclude_pattern, re.IGNORECASE) if exclude_pattern else None
+            ))
+        except re.error as e:
+            logger.error(f"Regex pattern compile error for {err.get('id', 'UNKNOWN')}: {e}")
+
+    _EXPERT_KB_CACHE[expert_knowledge_path] = (mtime, kb, compiled)
+    return kb, compiled
+
+
 def few_shot_rag_retrieve(expert_knowledge_path: str, log_path: str) -> dict:
     """
     Three-Step Few-shot RAG Retrieval Pipeline.
@@ -2415,8 +2678,7 @@ def few_shot_rag_retrieve(expert_knowledge_path: str, log_path: str) -> dict:
         }
 
     try:
-        with open(expert_knowledge_path, 'r', encoding='utf-8') as f:
-            kb = json.load(f)
+        kb, compiled_patterns = _load_expert_kb(expert_knowledge_path)
     except Exception as e:
         return {
             "status": "error",
@@ -2445,10 +2707,8 @@ def few_shot_rag_retrieve(expert_knowledge_path: str, log_path: str) -> dict:
     # 状态自愈：若归因工件缺失，自适应切换到原始编译日志尾部切片
     if not failure_region and os.path.exists(log_path):
         try:
-            with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                log_lines = f.readlines()
-            # 提取尾部 200 行编译日志切片作为特征源
-            failure_region = "".join(log_lines[-200:])
+            # 提取尾部 200 行编译日志切片作为特征源（超长行时按字节上限截断，避免数 MB 的 sanitizer 输出进入正则扫描）
+            failure_region = _read_tail_lines(log_path, 200, max_bytes=_PROMPT_LOG_TAIL_BYTES)
         except Exception as e:
             logger.error(f"Failed to read fallback compilation log tail: {e}")
 
@@ -2459,23 +2719,24 @@ def few_shot_rag_retrieve(expert_knowledge_path: str, log_path: str) -> dict:
             "rag_context": ""
         }
 
+    # 🔑 内容哈希记忆化：失败片段与知识库版本均未变时检索结果固定，跨轮次/重试命中时跳过正则扫描与排序
+    import hashlib
+    rag_key = (expert_knowledge_path, _EXPERT_KB_CACHE[expert_knowledge_path][0],
+               hashlib.sha256(failure_region.encode('utf-8', errors='ignore')).hexdigest())
+    cached_result = _RAG_RESULT_CACHE.get(rag_key)
+    if cached_result is not None:
+        logger.info("--- [Few-shot RAG] Failure region unchanged. Reusing cached retrieval result. ---")
+        return dict(cached_result)
+
     # 执行正负向双重正则特征匹配
     matched_errors = []
-    for err in kb.get("error_patterns", []):
-        pattern = err.get("pattern")
-        if not pattern:
-            continue
-        try:
-            # 正向特征匹配 ("眼睛" 扫描)
-            if re.search(pattern, failure_region, re.IGNORECASE):
-                # 负向噪音过滤
-                exclude_pattern = err.get("exclude_pattern")
-                if exclude_pattern and re.search(exclude_pattern, failure_region, re.IGNORECASE):
-                    # 命中了负向噪音特征，直接排除
-                    continue
-                matched_errors.append(err)
-        except Exception as e:
-            logger.error(f"Regex pattern match error for {err.get('id', 'UNKNOWN')}: {e}")
+    for err, pattern_re, exclude_re in compiled_patterns:
+        # 正向特征匹配 ("眼睛" 扫描)
+        if pattern_re.search(failure_region):
+            # 负向噪音过滤：命中了负向噪音特征，直接排除
+            if exclude_re and exclude_re.search(failure_region):
+                continue
+            matched_errors.append(err)
 
     # =================================================================
     # Step 2: 关键词关联扩展 (Keywords Intersection)
@@ -2562,12 +2823,16 @@ Target Scope: {", ".join(gl.get("target_files", ["*"]))}"""
     logger.info(
         f"--- [Few-shot RAG] Retrieved {len(matched_errors)} ERRs, {len(matched_guidelines)} GLs. Selected top 4 priorities. ---")
 
-    return {
+    result = {
         "status": "success",
         "matched_errors_count": len(matched_errors),
         "associated_guidelines_count": len(matched_guidelines),
         "rag_context": final_rag_context
     }
+    if len(_RAG_RESULT_CACHE) >= _RAG_RESULT_CACHE_MAX:
+        _RAG_RESULT_CACHE.pop(next(iter(_RAG_RESULT_CACHE)), None)
+    _RAG_RESULT_CACHE[rag_key] = result
+    return dict(result)
 
 
 def force_clean_git_repo(repo_path: str) -> Dict[str, str]:
@@ -2599,7 +2864,8 @@ def force_clean_git_repo(repo_path: str) -> Dict[str, str]:
 
         subprocess.run(["git", "switch", "-f", main_branch], capture_output=True, text=True, cwd=abs_repo_path,
                        check=True)
-        subprocess.run(["git", "clean", "-fxd"], capture_output=True, text=True, cwd=abs_repo_path, check=True)
+        subprocess.run(["git", "clean", "-fxd"], stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+                       cwd=abs_repo_path, check=True)
 
         return {'status': 'success', 'message': f"Successfully reclaimed and cleaned repo at '{repo_path}'."}
     except Exception as e:
@@ -2673,6 +2939,82 @@ def extract_build_metadata_from_log(log_path: str) -> Dict:
         return {'status': 'error', 'message': f"Unexpected parser crash on log extraction: {e}"}
 
 
+def _ensure_dir(directory: str) -> None:
+    """
+    目录已存在时仅需一次 stat；不做进程级缓存，因为回滚 (git clean / rmtree) 会在运行中删除目录。
+    """
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+
+
+def _stage_text_file(path: str, content: str) -> str:
+    """
+    将内容写入目标同目录的临时文件并 fsync，返回临时文件路径（尚未覆盖目标）。
+    """
+    dir_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name, prefix=f".{os.path.basename(path)}.tmp.{os.getpid()}.")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as tmp_f:
+            tmp_f.write(content)
+            tmp_f.flush()
+            os.fsync(tmp_f.fileno())
+        # mkstemp 默认 0600：沿用目标文件原权限（如 build.sh 的可执行位）
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o7777)
+        else:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+    except Exception:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def _atomic_write_text(path: str, content: str) -> None:
+    """
+    先写同目录临时文件并 fsync，再 os.replace 覆盖目标，避免中途崩溃留下截断文件。
+    """
+    tmp_path = _stage_text_file(path, content)
+    try:
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+
+def _atomic_write_many(contents: Dict[str, str]) -> None:
+    """
+    多文件原子写入：逐个写入并 fsync 各临时文件，全部就绪后再逐个 os.replace，
+    最后对每个父目录各 fsync 一次；任一文件暂存失败则清理全部临时文件，目标文件均保持原样。
+    """
+    if len(contents) <= 1:
+        for path, content in contents.items():
+            _atomic_write_text(path, content)
+        return
+
+    paths = list(contents)
+    staged = []
+    try:
+        for path in paths:
+            staged.append((path, _stage_text_file(path, contents[path])))
+    except Exception:
+        for _, tmp_path in staged:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+    for path, tmp_path in staged:
+        os.replace(tmp_path, path)
+
+    # 重命名本身的持久化：每个父目录只 fsync 一次
+    for dir_name in {os.path.dirname(os.path.abspath(p)) for p in paths}:
+        dir_fd = os.open(dir_name, os.O_RDONLY | getattr(os, "O_DIRECTORY", 0))
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
 def patch_project_dockerfile(
         project_name: str,
         oss_fuzz_path: str,
@@ -2734,8 +3076,7 @@ def patch_project_dockerfile(
 
                 content = re.sub(pattern, inject_checkout, content)
 
-        with open(dockerfile_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        _atomic_write_text(dockerfile_path, content)
 
         return {'status': 'success', 'message': "Dockerfile patched with pinned dependencies."}
     except Exception as e:
@@ -2793,6 +3134,8 @@ def update_yaml_report(file_path: str,
         try:
             with os.fdopen(fd, 'w', encoding='utf-8') as tmp_f:
                 yaml.dump(data, tmp_f, default_flow_style=False, sort_keys=False, allow_unicode=True)
+                tmp_f.flush()
+                os.fsync(tmp_f.fileno())
             os.replace(tmp_path, file_path)
         except Exception as e:
             if os.path.exists(tmp_path): os.remove(tmp_path)
@@ -2894,13 +3237,12 @@ def save_commit_diff_to_file(project_name: str, project_source_path: str, sha: s
         print(f"--- [ABLATION] Saving commit diff is DISABLED. ---")
         return {'status': 'error', 'message': 'History enhancement is disabled by ablation configuration.'}
 
-    import os
     import subprocess
     print(f"--- Tool: save_commit_diff_to_file (With Token Guard) for {sha} ---")
 
     TOKEN_GUARD_CHARS = 12000
     OUTPUT_PATH = "generated_prompt_file/commit_changed.txt"
-    os.makedirs("generated_prompt_file", exist_ok=True)
+    _ensure_dir("generated_prompt_file")
 
     try:
         raw_diff_res = subprocess.run(["git", "-C", project_source_path, "show", sha],
@@ -2933,9 +3275,7 @@ def read_projects_from_yaml(file_path: str) -> dict:
     Exempts 'projects.yaml' from whitelist checks and catches syntax corruption safely.
     """
     import os
-    import re
     import yaml
-    from datetime import datetime
     from utils.path_utils import normalize_patch_path, validate_patch_path
     from utils.error_handler import format_path_error
 
@@ -2998,27 +3338,26 @@ def read_projects_from_yaml(file_path: str) -> dict:
                     original_log_path = ""
 
                     if fuzzing_build_error_log_url.startswith("http"):
-                        from agent_tools import download_remote_log
                         download_result = download_remote_log(fuzzing_build_error_log_url, project_name, error_time_str)
                         if download_result['status'] == 'success':
                             original_log_path = download_result['local_path']
 
                     if not original_log_path and os.path.isdir(log_dir):
                         try:
-                            y, m, d = map(int, error_time_str.replace('.', '-').split('-'))
-                            base_date = datetime(y, m, d)
-                            candidates = []
+                            # 🔑 以 (Y, M, D) 整数元组做字典序比较，避免逐文件构造 datetime
+                            base_key = tuple(map(int, error_time_str.replace('.', '-').split('-')))
+                            if len(base_key) != 3:
+                                raise ValueError(f"Malformed error_time: {error_time_str}")
+                            best_key, best_name = None, None
                             for filename in os.listdir(log_dir):
-                                if "error.txt" in filename and re.match(r"\d{4}_\d{1,2}_\d{1,2} error\.txt", filename):
-                                    match = re.search(r"(\d{4})_(\d{1,2})_(\d{1,2})", filename)
-                                    if match:
-                                        fy, fm, fd = map(int, match.groups())
-                                        file_date = datetime(fy, fm, fd)
-                                        if file_date >= base_date:
-                                            candidates.append((file_date, filename))
-                            if candidates:
-                                candidates.sort(key=lambda x: x[0])
-                                original_log_path = os.path.abspath(os.path.join(log_dir, candidates[0][1]))
+                                match = _LOG_FILENAME_RE.match(filename)
+                                if not match:
+                                    continue
+                                key = (int(match.group(1)), int(match.group(2)), int(match.group(3)))
+                                if key >= base_key and (best_key is None or key < best_key):
+                                    best_key, best_name = key, filename
+                            if best_name:
+                                original_log_path = os.path.abspath(os.path.join(log_dir, best_name))
                         except Exception:
                             pass
 
@@ -3057,7 +3396,7 @@ def get_project_paths(project_name: str) -> Dict[str, str]:
     print(f"--- Tool: get_project_paths called for: {project_name} ---")
     base_path = os.path.abspath(os.path.join(os.path.dirname(__file__)))
 
-    safe_project_name = "".join(c for c in project_name if c.isalnum() or c in ('_', '-')).rstrip()
+    safe_project_name = _SAFE_NAME_RE.sub('', project_name).rstrip()
 
     config_path = os.path.join(base_path, "oss-fuzz", "projects", safe_project_name)
     config_repo_path = os.path.join(base_path, "oss-fuzz")
@@ -3140,26 +3479,32 @@ def read_projects_from_excel(file_path: str) -> Dict:
         return {'status': 'error', 'message': f"Excel file not found at '{file_path}'."}
 
     projects_to_run = []
+    workbook = None
     try:
-        workbook = openpyxl.load_workbook(file_path)
-        sheet = workbook.active
-        headers = [cell.value for cell in sheet[1]]
+        # read_only 流式解析：按行惰性返回 tuple，不为每行构造 Cell 对象
+        workbook = openpyxl.load_workbook(file_path, read_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = list(next(rows, ()))
 
         required_headers = ["项目名称", "复现oss-fuzz SHA", "报错是否一致", "是否尝试修复"]
         if not all(h in headers for h in required_headers):
             return {'status': 'error',
                     'message': f"Excel file is missing one of the required columns: {required_headers}"}
 
-        name_idx = headers.index("项目名称")
-        sha_idx = headers.index("复现oss-fuzz SHA")
-        consistent_idx = headers.index("报错是否一致")
-        attempted_idx = headers.index("是否尝试修复")
-
-        for row_index, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=2):
-            if row[consistent_idx] == "是" and row[attempted_idx] != "是":
+        # 一次 C 层调用取出所需四列，避免逐字段下标访问
+        column_indices = [headers.index(h) for h in required_headers]
+        getter = itemgetter(*column_indices)
+        min_width = max(column_indices) + 1
+
+        for row_index, row in enumerate(rows, start=2):
+            if len(row) < min_width:
+                # read_only 模式在表维度信息过期时可能返回短行：缺失的尾部单元格按空值补齐
+                row = tuple(row) + (None,) * (min_width - len(row))
+            name, sha, consistent, attempted = getter(row)
+            if consistent == "是" and attempted != "是":
                 project_info = {
-                    "project_name": row[name_idx],
-                    "sha": str(row[sha_idx]),
+                    "project_name": name,
+                    "sha": str(sha),
                     "row_index": row_index
                 }
                 projects_to_run.append(project_info)
@@ -3168,12 +3513,23 @@ def read_projects_from_excel(file_path: str) -> Dict:
         return {'status': 'success', 'projects': projects_to_run}
     except Exception as e:
         return {'status': 'error', 'message': f"Failed to read or parse Excel file: {e}"}
+    finally:
+        # read_only 模式必须显式关闭以释放底层 zip 句柄
+        if workbook is not None:
+            workbook.close()
+
+
+# 出现任一 Shell 语法字符（管道、重定向、变量展开、通配、命令串联等）时才需要交给 bash 解析
+_SHELL_SYNTAX_RE = re.compile(r'[|&;<>()$`*?#\[\]{}~!\n\\]')
 
 
 def run_command(command: str, timeout: int = 30, max_output_chars: int = 4000) -> dict:
     """
     Execute commands safely, compatible with LLM common Shell syntax,
     enforce zero-deletion policy, and return structured results.
+
+    Plain commands are split with shlex and exec'd directly, skipping the extra shell fork.
+    Commands using pipes, redirection, globbing, expansions or shell builtins still run via /bin/bash -c.
     """
     print(f"--- Tool: run_command called with: '{command}' ---")
 
@@ -3188,10 +3544,23 @@ def run_command(command: str, timeout: int = 30, max_output_chars: int = 4000) -
             "message": "🚫 Command blocked: Deletion or unsafe system-level operations are strictly forbidden. Use structured discovery tools instead (e.g., list_files_in_dir, read_file_content)."
         }
 
+    import shlex
+    import shutil
+
+    argv = None
+    if not _SHELL_SYNTAX_RE.search(command):
+        try:
+            argv = shlex.split(command)
+        except ValueError:
+            argv = None
+        # cd/export/source 等 Shell 内建命令无可执行文件，仍需 bash
+        if argv and shutil.which(argv[0]) is None:
+            argv = None
+
     try:
-        # ✅ 使用 /bin/bash -c 兼容大模型常用 Shell 语法（如管道符 |、重定向 >、标准错误抑制等）
+        # ✅ 简单命令直接 exec；含管道符 |、重定向 >、标准错误抑制等语法时回退 /bin/bash -c
         res = subprocess.run(
-            ['/bin/bash', '-c', command],
+            argv if argv else ['/bin/bash', '-c', command],
             capture_output=True, text=True, timeout=timeout, check=False
         )
 
@@ -3222,25 +3591,37 @@ def truncate_prompt_file(file_path: str, max_lines: int = 2000) -> Dict[str, str
     """
     Reads a file, and if it exceeds max_lines, truncates it in the middle, keeping the head and tail.
     """
+    from collections import deque
+
     print(f"--- Tool: truncate_prompt_file called for: {file_path} ---")
+    head_count = max_lines // 4
+    tail_count = max_lines - head_count
+    tmp_path = None
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-
-        if len(lines) <= max_lines:
-            message = "File is within line limits, no truncation needed."
-            print(f"--- {message} ---")
-            return {"status": "success", "message": message}
+        # 🔑 单遍流式处理：头部直接写入临时文件，其余行仅保留在定长环形缓冲中，不再整体 readlines
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), prefix=".truncate_tmp_")
+        tail = deque(maxlen=tail_count)
+        total = 0
+        with open(file_path, 'rb') as src, os.fdopen(fd, 'wb') as tmp_f:
+            for line in src:
+                total += 1
+                if total <= head_count:
+                    tmp_f.write(line)
+                else:
+                    tail.append(line)
 
-        head_count = max_lines // 4
-        tail_count = max_lines - head_count
+            if total <= max_lines:
+                os.remove(tmp_path)
+                tmp_path = None
+                message = "File is within line limits, no truncation needed."
+                print(f"--- {message} ---")
+                return {"status": "success", "message": message}
 
-        truncated_content = "".join(lines[:head_count])
-        truncated_content += "\n\n... (Content truncated due to context length limit) ...\n\n"
-        truncated_content += "".join(lines[-tail_count:])
+            tmp_f.write("\n\n... (Content truncated due to context length limit) ...\n\n".encode('utf-8'))
+            tmp_f.writelines(tail)
 
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(truncated_content)
+        os.replace(tmp_path, file_path)
+        tmp_path = None
 
         message = f"File '{file_path}' was truncated to approximately {max_lines} lines."
         print(f"--- {message} ---")
@@ -3249,20 +3630,41 @@ def truncate_prompt_file(file_path: str, max_lines: int = 2000) -> Dict[str, str
         message = f"Failed to truncate file '{file_path}': {e}"
         print(f"--- ERROR: {message} ---")
         return {"status": "error", "message": message}
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+_FICLONE = 0x40049409
+
+
+def _reflink_copy(src: str, dst: str) -> str:
+    """
+    优先使用 FICLONE 在 Btrfs/XFS 等 CoW 文件系统上做 O(1) 元数据克隆；不支持时回退 shutil.copy2。
+    """
+    import shutil
+
+    try:
+        import fcntl
+        with open(src, 'rb') as s_f, open(dst, 'wb') as d_f:
+            fcntl.ioctl(d_f.fileno(), _FICLONE, s_f.fileno())
+        shutil.copystat(src, dst)
+        return dst
+    except (ImportError, OSError):
+        return shutil.copy2(src, dst)
 
 
 def archive_fixed_project(project_name: str, project_config_path: str, is_success: bool = True,
                           project_source_path: str = None) -> dict:
     import os, shutil, subprocess
     from datetime import datetime
-    from agent_tools import TraceLedgerManager
 
     print(f"--- Tool: archive_fixed_project called for: {project_name} (Success: {is_success}) ---")
     try:
         # 1. 初始化路径与目录
         base_dir = "process/fixed" if is_success else "process/unfixed"
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_name = "".join(c for c in project_name if c.isalnum() or c in ('_', '-')).rstrip()
+        safe_name = _SAFE_NAME_RE.sub('', project_name).rstrip()
         destination_dir = os.path.join(os.getcwd(), base_dir, f"{safe_name}_{timestamp}")
 
         os.makedirs(destination_dir, exist_ok=True)  # 必须存在
@@ -3314,13 +3716,14 @@ def archive_fixed_project(project_name: str, project_config_path: str, is_succes
                 if dest_sub != "source":
                     for f_rel in changed_files:
                         src, dst = os.path.join(path, f_rel), os.path.join(destination_dir, dest_sub, f_rel)
-                        os.makedirs(os.path.dirname(dst), exist_ok=True)
-                        shutil.copy2(src, dst)
+                        _ensure_dir(os.path.dirname(dst))
+                        _reflink_copy(src, dst)
                 with open(os.path.join(destination_dir, "diffs", patch_name), "w") as pf:
                     subprocess.run(["git", "-C", path, "diff", baseline_sha, "HEAD"], stdout=pf, check=True)
             else:
                 if dest_sub != "source":
-                    shutil.copytree(path, os.path.join(destination_dir, f"{dest_sub}_all"), dirs_exist_ok=True)
+                    shutil.copytree(path, os.path.join(destination_dir, f"{dest_sub}_all"), dirs_exist_ok=True,
+                                    copy_function=_reflink_copy)
         
         # 4. 强制物理清理
         def _safe_physical_remove(dir_path: str):
@@ -3361,7 +3764,7 @@ def download_github_repo(project_name: str, target_dir: str, repo_url: Optional[
     if project_name == "oss-fuzz":
         final_target_dir = os.path.abspath(target_dir)
     else:
-        safe_name = "".join(c for c in project_name if c.isalnum() or c in ('_', '-')).rstrip()
+        safe_name = _SAFE_NAME_RE.sub('', project_name).rstrip()
         final_target_dir = os.path.abspath(os.path.join(current_work_dir, "process", "project", safe_name))
 
         if os.path.abspath(target_dir) != final_target_dir:
@@ -3409,17 +3812,12 @@ def download_github_repo(project_name: str, target_dir: str, repo_url: Optional[
             except Exception as e:
                 return {'status': 'error', 'message': f"Search failed: {e}"}
 
-    # 5. Git 大文件传输参数优化
-    subprocess.run(["git", "config", "--global", "http.postBuffer", "524288000"])
-    subprocess.run(["git", "config", "--global", "http.lowSpeedLimit", "0"])
-    subprocess.run(["git", "config", "--global", "http.lowSpeedTime", "999999"])
-
     max_retries = 3
     for attempt in range(max_retries):
         print(f"--- Download attempt {attempt + 1}/{max_retries} ---")
         try:
-            # 🔑 6. 全量 clone 锁死（彻底抛弃 --depth 1 以免丢失提交树）
-            clone_cmd = ["git", "clone", final_repo_url, final_target_dir]
+            # 🔑 5. 全量 clone 锁死（彻底抛弃 --depth 1 以免丢失提交树），随命令下发大文件传输参数
+            clone_cmd = ["git", *_GIT_HTTP_OPTS, "clone", final_repo_url, final_target_dir]
             result = subprocess.run(clone_cmd, capture_output=True, text=True)
             if result.returncode == 0:
                 return {'status': 'success', 'path': final_target_dir,
@@ -3428,14 +3826,40 @@ def download_github_repo(project_name: str, target_dir: str, repo_url: Optional[
                 print(f"--- Attempt {attempt + 1} failed: {result.stderr} ---")
         except Exception as e:
             print(f"--- Attempt {attempt + 1} exception: {e} ---")
-        time.sleep(10 * (attempt + 1))
+        if attempt + 1 < max_retries:
+            time.sleep(10 * (attempt + 1))
 
     return {'status': 'error', 'message': f"Failed to download {project_name} after {max_retries} attempts."}
 
 
+@lru_cache(maxsize=4)
+def _load_sorted_commits(commits_file_path: str, mtime: float) -> Tuple[Tuple[datetime, str], ...]:
+    """
+    解析提交列表文件为按时间排序的 (datetime, sha) 元组；以 (路径, mtime) 为键缓存，文件未变时不重复解析。
+    时间格式固定为 'YYYY.MM.DD HH:MM'，直接按分隔符拆分取整，避免逐行 strptime。
+    """
+    commits: List[Tuple[datetime, str]] = []
+    with open(commits_file_path, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    for i in range(len(lines) - 1):
+        line = lines[i].strip()
+        next_line = lines[i + 1].strip()
+        if line.startswith("Time: ") and next_line.startswith("- SHA: "):
+            try:
+                date_part, time_part = line[len("Time: "):].split(" ")
+                year, month, day = map(int, date_part.split("."))
+                hour, minute = map(int, time_part.split(":"))
+                commits.append((datetime(year, month, day, hour, minute), next_line.replace("- SHA: ", "")))
+            except ValueError:
+                pass
+    commits.sort()
+    return tuple(commits)
+
+
 def find_sha_for_timestamp(commits_file_path: str, error_date: str) -> Dict[str, str]:
     """
     Finds the most suitable commit SHA for a given date from a commits file.
+    Prefers the earliest commit on that date, otherwise the latest commit before it.
     """
     print(f"--- Tool: find_sha_for_timestamp called for date: {error_date} ---")
     try:
@@ -3443,41 +3867,19 @@ def find_sha_for_timestamp(commits_file_path: str, error_date: str) -> Dict[str,
     except ValueError:
         return {'status': 'error', 'message': f"Invalid target date format: '{error_date}'. Expected 'YYYY.MM.DD'."}
 
-    todays_commits: List[Tuple[datetime, str]] = []
-    past_commits: List[Tuple[datetime, str]] = []
-
     try:
-        with open(commits_file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        i = 0
-        while i < len(lines):
-            line = lines[i].strip()
-            if line.startswith("Time: ") and i + 1 < len(lines) and lines[i + 1].strip().startswith("- SHA: "):
-                try:
-                    timestamp_str = line.replace("Time: ", "")
-                    commit_datetime = datetime.strptime(timestamp_str, '%Y.%m.%d %H:%M')
-                    sha = lines[i + 1].strip().replace("- SHA: ", "")
-                    commit_date = commit_datetime.date()
-                    if commit_date == target_date:
-                        todays_commits.append((commit_datetime, sha))
-                    elif commit_date < target_date:
-                        past_commits.append((commit_datetime, sha))
-                except (ValueError, IndexError):
-                    pass
-            i += 1
+        commits = _load_sorted_commits(commits_file_path, os.path.getmtime(commits_file_path))
     except FileNotFoundError:
         return {'status': 'error', 'message': f"Commits file not found at: {commits_file_path}"}
     except Exception as e:
         return {'status': 'error', 'message': f"An unexpected error occurred: {e}"}
 
-    if todays_commits:
-        earliest_today = min(todays_commits)
-        found_sha = earliest_today[1]
-        return {'status': 'success', 'sha': found_sha}
-    elif past_commits:
-        latest_in_past = max(past_commits)
-        found_sha = latest_in_past[1]
-        return {'status': 'success', 'sha': found_sha}
+    # 🔑 二分定位目标日 00:00 之后的第一个提交：同日则取当日最早，否则取其前一个（过去最晚）
+    idx = bisect_left(commits, (datetime(target_date.year, target_date.month, target_date.day),))
+    if idx < len(commits) and commits[idx][0].date() == target_date:
+        return {'status': 'success', 'sha': commits[idx][1]}
+    elif idx > 0:
+        return {'status': 'success', 'sha': commits[idx - 1][1]}
     else:
         return {'status': 'error', 'message': f"No suitable SHA found on or before the date {error_date}."}
 
@@ -3498,16 +3900,9 @@ def checkout_oss_fuzz_commit(sha: str) -> Dict[str, str]:
         return {'status': 'error', 'message': f"The directory '{oss_fuzz_path}' is not a git repository."}
 
     try:
-        # 在指定 oss_fuzz_path 路径下获取主干分支名
-        branch_res = subprocess.run(["git", "branch"], capture_output=True, text=True, cwd=oss_fuzz_path, check=True)
-        main_branch = "main" if "main" in branch_res.stdout else "master"
-
-        # 强制切回主干并拉取
-        subprocess.run(["git", "switch", main_branch], capture_output=True, text=True, cwd=oss_fuzz_path, check=True)
-
-        # 执行目标 commit 的切换
-        command = ["git", "checkout", sha]
-        result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8', cwd=oss_fuzz_path)
+        # 🔑 直接切换到目标 commit：最终同为 detached HEAD，无需先探测主干分支再 switch
+        result = subprocess.run(["git", "checkout", sha], capture_output=True, text=True, encoding='utf-8',
+                                cwd=oss_fuzz_path)
 
         if result.returncode == 0:
             return {'status': 'success', 'message': f"Successfully checked out SHA {sha} in oss-fuzz."}
@@ -3517,6 +3912,53 @@ def checkout_oss_fuzz_commit(sha: str) -> Dict[str, str]:
         return {'status': 'error', 'message': f"An unexpected error occurred during oss-fuzz checkout: {e}"}
 
 
+def _write_text_direct(path: str, text: str, append: bool = False) -> None:
+    """
+    绕过文本 IO 层，一次 os.open + os.write 将整段内容落盘（append=True 时追加写入）。
+    """
+    _write_bytes_direct(path, text.encode("utf-8"), append)
+
+
+def _write_bytes_direct(path: str, payload: bytes, append: bool = False) -> None:
+    """已编码的字节内容（bytes/bytearray）直接 os.write 落盘，无需再经过 str 编码。"""
+    flags = os.O_WRONLY | os.O_CREAT | (os.O_APPEND if append else os.O_TRUNC)
+    data = memoryview(payload)
+    fd = os.open(path, flags, 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+def _list_tree_with_find(directory_path: str) -> Optional[Dict[bytes, List[Tuple[bytes, bool]]]]:
+    """
+    一次 find 调用取回整棵目录树（跳过隐藏项，不跟随软链接），返回 {相对目录: [(名称, 是否目录), ...]}。
+    名称保持 find 输出的原始字节，由调用方直接拼入字节缓冲，免去逐项解码再编码。
+    find 不可用或执行失败时返回 None，由调用方回退到 Python 遍历。
+    """
+    try:
+        res = subprocess.run(
+            ["find", directory_path, "-mindepth", "1", "-name", ".*", "-prune", "-o", "-printf", "%y %P\\0"],
+            capture_output=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+    children: Dict[bytes, List[Tuple[bytes, bool]]] = {b"": []}
+    for record in res.stdout.split(b"\0"):
+        if not record:
+            continue
+        kind, rel_path = record[:1], record[2:]
+        parent, _, name = rel_path.rpartition(b"/")
+        children.setdefault(parent, []).append((name, kind == b"d"))
+        if kind == b"d":
+            children.setdefault(rel_path, [])
+    for entries in children.values():
+        entries.sort()
+    return children
+
+
 def save_file_tree(directory_path: str, output_file: Optional[str] = None) -> dict:
     """
     Gets the file tree structure of a specified directory path and saves it to a file.
@@ -3533,26 +3975,48 @@ def save_file_tree(directory_path: str, output_file: Optional[str] = None) -> di
         final_output_path = output_file
     output_dir = os.path.dirname(final_output_path)
     try:
-        if output_dir:
-            os.makedirs(output_dir, exist_ok=True)
-        tree_lines = []
-
-        def _build_tree_recursive(path, prefix=""):
-            entries = sorted([e for e in os.listdir(path) if not e.startswith('.')])
-            pointers = ["├── "] * (len(entries) - 1) + ["└── "]
-            for pointer, entry in zip(pointers, entries):
-                full_path = os.path.join(path, entry)
-                if os.path.isdir(full_path):
-                    tree_lines.append(f"{prefix}{pointer}📁 {entry}")
-                    extension = "│   " if pointer == "├── " else "    "
-                    _build_tree_recursive(full_path, prefix + extension)
-                else:
-                    tree_lines.append(f"{prefix}{pointer}📄 {entry}")
-
-        tree_lines.insert(0, f"📁 {os.path.basename(os.path.abspath(directory_path))}")
-        _build_tree_recursive(directory_path, prefix="")
-        with open(final_output_path, "w", encoding="utf-8") as f:
-            f.write("\n".join(tree_lines))
+        _ensure_dir(output_dir)
+        # 🔑 整棵树直接以 UTF-8 字节累积到单个 bytearray（原地扩容），末尾一次写盘，省去逐行 str 拼接与整体编码
+        buf = bytearray("📁 ".encode("utf-8"))
+        buf += os.fsencode(os.path.basename(os.path.abspath(directory_path)))
+        root_bytes = os.fsencode(directory_path)
+
+        # 🔑 大目录优先用单次 find 取回整棵树，避免 Python 逐目录遍历；不可用时回退 scandir
+        find_children = _list_tree_with_find(directory_path)
+
+        def _list_entries(rel_path: bytes) -> List[Tuple[bytes, bool]]:
+            if find_children is not None:
+                return find_children.get(rel_path, [])
+            # 以 bytes 路径调用 scandir，名称即为原始字节；DirEntry 直接读取 d_type，省去逐项 isdir 的 stat 调用
+            with os.scandir(os.path.join(root_bytes, rel_path) if rel_path else root_bytes) as it:
+                return sorted((e.name, e.is_dir(follow_symlinks=False)) for e in it if not e.name.startswith(b'.'))
+
+        last_pointer = "└── ".encode("utf-8")
+        mid_pointer = "├── ".encode("utf-8")
+        dir_marker = "📁 ".encode("utf-8")
+        file_marker = "📄 ".encode("utf-8")
+        mid_extension = "│   ".encode("utf-8")
+        last_extension = b"    "
+
+        # 🔑 显式栈替代递归：栈元素为待输出行 (None, 行字节) 或待展开目录 (rel_path, prefix)，逆序压栈保持先序输出
+        stack: List[Tuple[Optional[bytes], bytes]] = [(b"", b"")]
+        while stack:
+            rel_path, payload = stack.pop()
+            if rel_path is None:
+                buf += b"\n"
+                buf += payload
+                continue
+            entries = _list_entries(rel_path)
+            last_idx = len(entries) - 1
+            for idx in range(last_idx, -1, -1):
+                name, is_dir = entries[idx]
+                is_last = idx == last_idx
+                if is_dir:
+                    child = rel_path + b"/" + name if rel_path else name
+                    stack.append((child, payload + (last_extension if is_last else mid_extension)))
+                stack.append((None, payload + (last_pointer if is_last else mid_pointer)
+                              + (dir_marker if is_dir else file_marker) + name))
+        _write_bytes_direct(final_output_path, buf)
         success_message = f"File tree has been successfully generated and saved to '{final_output_path}'."
         print(success_message)
         return {"status": "success", "message": success_message}
@@ -3562,6 +4026,35 @@ def save_file_tree(directory_path: str, output_file: Optional[str] = None) -> di
         return {"status": "error", "message": error_message}
 
 
+# 浅层文件树缓存：(根目录绝对路径, max_depth) -> ({已展开目录: st_mtime_ns}, 树文本)
+_SHALLOW_TREE_CACHE: Dict[Tuple[str, int], Tuple[Dict[str, int], str]] = {}
+# 树文本最近一次落盘记录：输出文件绝对路径 -> (st_mtime_ns, st_size, 缓存键)，文件未被改动时命中缓存无需重写
+_SHALLOW_TREE_OUTPUTS: Dict[str, Tuple[int, int, Tuple[str, int]]] = {}
+
+
+def _write_shallow_tree_output(output_file: str, tree_text: str, cache_key: Tuple[str, int]) -> None:
+    _write_text_direct(output_file, tree_text)
+    st = os.stat(output_file)
+    _SHALLOW_TREE_OUTPUTS[os.path.abspath(output_file)] = (st.st_mtime_ns, st.st_size, cache_key)
+
+
+def _shallow_tree_output_current(output_file: str, cache_key: Tuple[str, int]) -> bool:
+    """输出文件仍是本缓存键上次写入的内容（mtime/size 未变）时返回 True。"""
+    try:
+        st = os.stat(output_file)
+    except OSError:
+        return False
+    return _SHALLOW_TREE_OUTPUTS.get(os.path.abspath(output_file)) == (st.st_mtime_ns, st.st_size, cache_key)
+
+
+def _dir_mtimes_unchanged(dir_mtimes: Dict[str, int]) -> bool:
+    """逐个 stat 已展开目录；目录项增删改名都会刷新其 mtime，全部未变即说明树结构未变。"""
+    try:
+        return all(os.stat(path).st_mtime_ns == mtime for path, mtime in dir_mtimes.items())
+    except OSError:
+        return False
+
+
 @_safe_path_wrapper("save_file_tree_shallow")
 def save_file_tree_shallow(directory_path: str, max_depth: int, output_file: Optional[str] = None, **kwargs) -> dict:
     """
@@ -3578,16 +4071,38 @@ def save_file_tree_shallow(directory_path: str, max_depth: int, output_file: Opt
         output_file = "generated_prompt_file/file_tree.txt"
 
     try:
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        tree_lines = []
-
-        def _build_tree_recursive(path, prefix="", depth=0):
+        _ensure_dir(os.path.dirname(output_file))
+
+        # 🔑 修复循环中项目结构通常未变：所有已展开目录的 mtime 均未变化时直接复用上次的树文本
+        cache_key = (os.path.abspath(directory_path), max_depth)
+        cached = _SHALLOW_TREE_CACHE.get(cache_key)
+        if cached and _dir_mtimes_unchanged(cached[0]):
+            if not _shallow_tree_output_current(output_file, cache_key):
+                _write_shallow_tree_output(output_file, cached[1], cache_key)
+            return {"status": "success", "message": f"Shallow file tree saved successfully to {output_file}."}
+
+        tree_lines = [f"📁 {os.path.basename(os.path.abspath(directory_path))}"]
+        dir_mtimes: Optional[Dict[str, int]] = {}
+
+        # 显式栈：元素为待输出行 (str) 或待展开目录 (path, prefix, depth)
+        stack: List[Any] = [(directory_path, "", 0)]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                tree_lines.append(item)
+                continue
+            path, prefix, depth = item
             if depth >= max_depth:
-                return
+                continue
             try:
-                entries = sorted([e for e in os.listdir(path) if not e.startswith('.')])
+                # 先记录 mtime 再列目录：两者之间若有改动，下次校验必然失配
+                if dir_mtimes is not None:
+                    dir_mtimes[os.path.abspath(path)] = os.stat(path).st_mtime_ns
+                with os.scandir(path) as it:
+                    entries = sorted((e for e in it if not e.name.startswith('.')), key=lambda e: e.name)
             except OSError:
                 entries = []
+                dir_mtimes = None  # 列目录失败的结果不进入缓存
 
             # 🔑 1. 根目录与子目录级联配额控制：根目录最大展示 30 行，次级目录最大展示 15 行
             is_root = (depth == 0)
@@ -3595,25 +4110,27 @@ def save_file_tree_shallow(directory_path: str, max_depth: int, output_file: Opt
             truncated = len(entries) > limit
             active_entries = entries[:limit]
 
-            pointers = ["├── "] * (len(active_entries) - 1) + ["└── "]
-            for pointer, entry in zip(pointers, active_entries):
-                full_path = os.path.join(path, entry)
-                if os.path.isdir(full_path) and not os.path.islink(full_path):
-                    tree_lines.append(f"{prefix}{pointer}📁 {entry}")
+            pending = []
+            for idx, entry in enumerate(active_entries):
+                pointer = "└── " if idx == len(active_entries) - 1 else "├── "
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(f"{prefix}{pointer}📁 {entry.name}")
                     extension = "│   " if pointer == "├── " else "    "
-                    _build_tree_recursive(full_path, prefix + extension, depth + 1)
+                    pending.append((entry.path, prefix + extension, depth + 1))
                 else:
-                    tree_lines.append(f"{prefix}{pointer}📄 {entry}")
+                    pending.append(f"{prefix}{pointer}📄 {entry.name}")
 
             # 🔑 2. 提供可视化的截断提示，告知 Agent 当前结构被截断
             if truncated:
-                tree_lines.append(f"{prefix}└── ... [truncated: {len(entries) - limit} entries hidden]")
-
-        tree_lines.append(f"📁 {os.path.basename(os.path.abspath(directory_path))}")
-        _build_tree_recursive(directory_path, prefix="", depth=0)
+                pending.append(f"{prefix}└── ... [truncated: {len(entries) - limit} entries hidden]")
+            stack.extend(reversed(pending))
 
-        with open(output_file, "w", encoding="utf-8") as f:
-            f.write("\n".join(tree_lines))
+        tree_text = "\n".join(tree_lines)
+        _write_shallow_tree_output(output_file, tree_text, cache_key)
+        if dir_mtimes is not None:
+            _SHALLOW_TREE_CACHE[cache_key] = (dir_mtimes, tree_text)
+        else:
+            _SHALLOW_TREE_CACHE.pop(cache_key, None)
 
         return {"status": "success", "message": f"Shallow file tree saved successfully to {output_file}."}
     except Exception as e:
@@ -3630,7 +4147,7 @@ def find_and_append_file_details(
     """
     Finds a file or directory matching a keyword and appends details.
     🔑 优化：强制接入 @_safe_path_wrapper 装饰器安全网；
-    🔑 优化：加入物理真实路径(os.path.realpath)防循环死锁校验，剔除无限递归崩溃。
+    🔑 优化：不跟随软链接遍历并剔除软链接目录，杜绝环形链接导致的无限递归。
     """
     import os
 
@@ -3641,54 +4158,134 @@ def find_and_append_file_details(
         output_file = "generated_prompt_file/file_tree.txt"
 
     try:
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        found_paths = []
-        visited_real_paths = set()  # 🔑 用于防止无限递归的符号链接物理查重集合
-
-        for root, dirs, files in os.walk(directory_path, followlinks=True):
-            # 🔑 1. 计算并查重物理真实路径，如果是环形链接，直接修剪分支，抛弃子目录搜索
-            real_root = os.path.realpath(root)
-            if real_root in visited_real_paths:
-                dirs.clear()  # 阻断 os.walk 向下级递归
+        _ensure_dir(os.path.dirname(output_file))
+        found_is_dir: Dict[str, bool] = {}
+        # 关键词含路径分隔符时可能横跨 root 与 entry，只能对拼接后的完整路径做子串匹配
+        spans_separator = os.sep in search_keyword
+
+        # 🔑 scandir 显式栈遍历：DirEntry 自带 d_type，无需逐项 islink/isdir 额外 stat
+        stack = [directory_path]
+        while stack:
+            root = stack.pop()
+            try:
+                with os.scandir(root) as it:
+                    entries = list(it)
+            except OSError:
                 continue
-            visited_real_paths.add(real_root)
 
-            # 🔑 2. 安全截断目录列表，物理上剔除所有软链接目录
-            dirs[:] = [d for d in dirs if not os.path.islink(os.path.join(root, d))]
-
-            all_entries = dirs + files
-            for entry in all_entries:
-                full_path = os.path.join(root, entry)
-                if search_keyword in full_path:
-                    found_paths.append(full_path)
+            # 🔑 先对 root / entry 名做子串判断，仅命中时才拼接完整路径，避免逐项分配字符串
+            root_matched = search_keyword in root
+            for entry in entries:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                # 物理上剔除所有软链接目录（既不下探也不计入匹配）
+                if not is_dir and entry.is_symlink() and entry.is_dir():
+                    continue
+                if is_dir:
+                    stack.append(entry.path)
+                if root_matched or search_keyword in entry.name or (spans_separator and search_keyword in entry.path):
+                    found_is_dir[entry.path] = is_dir
 
-        found_paths = sorted(list(set(found_paths)))
+        found_paths = sorted(found_is_dir)
         if not found_paths:
             message = f"No file or directory matching '{search_keyword}' was found."
-            with open(output_file, "a", encoding="utf-8") as f:
-                f.write(f"\n\n--- Detailed query result for '{search_keyword}' ---\n{message}\n")
+            _write_text_direct(output_file, f"\n\n--- Detailed query result for '{search_keyword}' ---\n{message}\n",
+                               append=True)
             return {"status": "success", "message": message}
 
         details_to_append = [f"\n\n--- Detailed query result for '{search_keyword}' ---"]
         for path in found_paths:
             relative_path = os.path.relpath(path, directory_path)
             details_to_append.append(f"\n# Matched path: {relative_path}")
-            if os.path.isdir(path):
+            if found_is_dir[path]:
                 # 约束单个子目录展示数量，防止打印爆炸
-                entries = sorted([e for e in os.listdir(path) if not e.startswith('.')])
+                with os.scandir(path) as it:
+                    entries = sorted((e for e in it if not e.name.startswith('.')), key=lambda e: e.name)
                 for entry in entries[:15]:
-                    details_to_append.append(f"├── {'📁' if os.path.isdir(os.path.join(path, entry)) else '📄'} {entry}")
+                    details_to_append.append(f"├── {'📁' if entry.is_dir() else '📄'} {entry.name}")
             else:
                 details_to_append.append(f"📄 {os.path.basename(path)}")
 
-        with open(output_file, "a", encoding="utf-8") as f:
-            f.write("\n".join(details_to_append))
+        _write_text_direct(output_file, "\n".join(details_to_append), append=True)
 
         return {"status": "success", "message": f"Appended details of '{search_keyword}' successfully."}
     except Exception as e:
         return {"status": "error", "message": f"Error in find_and_append_file_details: {str(e)}"}
 
 
+def _scan_file_window(resolved_path: str) -> Tuple[List[str], List[str], int]:
+    """
+    扫描文件得到 (剥离 License 后的头部 100 行, 末尾至多 1000 行, 有效总行数)。
+    """
+    import mmap
+    from collections import deque
+    from contextlib import nullcontext
+    from itertools import islice
+
+    # 🔑 仅物化头部 100 行（License 检测 + head_50）与尾部窗口，中段不驻留内存。
+    # read_file_content 各模式最多需要末尾 1000 行（full 模式上限），因此 1000 行尾窗即可覆盖全部分支。
+    TAIL_WINDOW = 1000
+
+    def _strip_license_header(head_lines: List[str]) -> List[str]:
+        # A. 自动剥离 License/Header 头部 (节省 Token)：str.startswith 前缀判断，无需逐行进入正则引擎
+        start_idx = 0
+        for i, line in enumerate(head_lines[:50]):
+            stripped = line.lstrip()
+            if stripped and not stripped.startswith(_LICENSE_HEADER_PREFIXES):
+                start_idx = i
+                break
+        if start_idx > 5:
+            print(f"--- Stripped license header ({start_idx} lines) ---")
+            return head_lines[start_idx:]
+        return head_lines
+
+    def _split_lines(text: str) -> List[str]:
+        parts = text.split("\n")
+        result = [p + "\n" for p in parts[:-1]]
+        if parts[-1]:
+            result.append(parts[-1])
+        return result
+
+    file_size = os.path.getsize(resolved_path)
+    with open(resolved_path, 'rb') as bf, \
+            (mmap.mmap(bf.fileno(), 0, access=mmap.ACCESS_READ) if file_size else nullcontext(b"")) as mm:
+        # 下方 \r 探测与分块换行计数均为整段顺序扫描：提示内核加大预读
+        if file_size and hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        # 无 \r 时行边界只有 \n：直接在 mmap 上定位头部/统计行数，尾部交给 _read_tail_lines 反向切片，仅解码头尾
+        byte_scan = mm.find(b"\r") == -1
+        if byte_scan:
+            head_end = 0
+            for _ in range(100):
+                nl = mm.find(b"\n", head_end)
+                if nl == -1:
+                    head_end = file_size
+                    break
+                head_end = nl + 1
+            raw_head = _split_lines(mm[:head_end].decode('utf-8', errors='ignore'))
+            head = _strip_license_header(raw_head)
+
+            raw_total = sum(mm[i:i + (1 << 24)].count(b"\n") for i in range(0, file_size, 1 << 24))
+            if file_size and mm[file_size - 1:file_size] != b"\n":
+                raw_total += 1
+            total_lines = raw_total - (len(raw_head) - len(head))
+
+    if byte_scan:
+        lines = _split_lines(_read_tail_lines(resolved_path, min(TAIL_WINDOW, total_lines)))
+    else:
+        # 含 \r 的文件走通用换行的文本流式读取，保持原有行切分语义
+        with open(resolved_path, 'r', encoding='utf-8', errors='ignore') as f:
+            _advise_sequential(f.fileno())
+            head = _strip_license_header(list(islice(f, 100)))
+            tail = deque(head, maxlen=TAIL_WINDOW)
+            total_lines = len(head)
+            for line in f:
+                tail.append(line)
+                total_lines += 1
+        lines = list(tail)
+
+    return head, lines, total_lines
+
+
 @_safe_path_wrapper(operation_name="read_file_content")
 def read_file_content(file_path: str, mode: str = "full", base_dir: str = None) -> dict:
     """
@@ -3696,7 +4293,7 @@ def read_file_content(file_path: str, mode: str = "full", base_dir: str = None)
     1. 集成新机制：路径规范化、白名单校验、物理缺失路径纠错引导。
     2. 集成旧系统：License 自动剥离、多模式切片、500行硬熔断阈值防止 Token 溢出。
     """
-    import os, re
+    import os
     from utils.path_utils import DEFAULT_PROJECT_ROOT
 
     # 1. 路径解析基准对齐
@@ -3725,21 +4322,8 @@ def read_file_content(file_path: str, mode: str = "full", base_dir: str = None)
 
     # 3. 执行读取与防御性处理
     try:
-        with open(resolved_path, 'r', encoding='utf-8', errors='ignore') as f:
-            lines = f.readlines()
-
-        # A. 自动剥离 License/Header 头部 (节省 Token)
-        license_pattern = re.compile(r"^(#|//|\s*\*|/\*).*$", re.MULTILINE)
-        start_idx = 0
-        for i, line in enumerate(lines[:50]):
-            if line.strip() and not license_pattern.match(line):
-                start_idx = i
-                break
-        if start_idx > 5:
-            lines = lines[start_idx:]
-            print(f"--- Stripped license header ({start_idx} lines) ---")
+        head, lines, total_lines = _scan_file_window(resolved_path)
 
-        total_lines = len(lines)
         MAX_SAFE_LINES = 500  # 硬熔断阈值
 
         # B. 根据模式进行按行切片，并执行 Safety Melt 策略
@@ -3778,7 +4362,7 @@ def read_file_content(file_path: str, mode: str = "full", base_dir: str = None)
         elif mode == "tail_30":  # 这里是固定的 30 行
             lines = lines[-30:]
         elif mode == "head_50":
-            lines = lines[:50]
+            lines = head[:50]
         else:
             # 未知模式默认硬截断为后 100 行
             if total_lines > 100:
@@ -3796,6 +4380,30 @@ def read_file_content(file_path: str, mode: str = "full", base_dir: str = None)
         return {"status": "error", "message": f"Read operation failed: {str(e)}"}
 
 
+def read_files_batch(file_paths: List[str], mode: str = "full") -> dict:
+    """
+    批量读取多个文件：一次工具调用内线程池并发执行 read_file_content（逐个路径仍经白名单校验与 Safety Melt），
+    省去逐文件往返一次 LLM 工具调用。
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    if not file_paths:
+        return {"status": "error", "message": "file_paths must contain at least one path.", "results": {}}
+
+    unique_paths = list(dict.fromkeys(file_paths))
+    print(f"--- Tool: read_files_batch called for {len(unique_paths)} file(s) (Mode: {mode}) ---")
+    with ThreadPoolExecutor(max_workers=min(8, len(unique_paths))) as pool:
+        results = dict(zip(unique_paths, pool.map(lambda p: read_file_content(p, mode=mode), unique_paths)))
+
+    failed = [p for p, res in results.items() if res.get("status") != "success"]
+    return {
+        "status": "success" if not failed else ("partial_success" if len(failed) < len(results) else "error"),
+        "message": f"Read {len(results) - len(failed)}/{len(results)} files." + (
+            f" Failed: {', '.join(failed)}" if failed else ""),
+        "results": results
+    }
+
+
 @_safe_path_wrapper(operation_name="create_or_update_file")
 def create_or_update_file(file_path: str, content: str, **kwargs) -> dict:
     """
@@ -3812,12 +4420,22 @@ def create_or_update_file(file_path: str, content: str, **kwargs) -> dict:
 
     try:
         # 安全级联创建可能缺失的父目录结构
-        directory = os.path.dirname(resolved_path)
-        if directory:
-            os.makedirs(directory, exist_ok=True)
+        _ensure_dir(os.path.dirname(resolved_path))
 
-        with open(resolved_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        # 🔑 幂等写入：目标已是相同内容时跳过写盘，不刷新 mtime（避免下游按 mtime 的缓存失效与无谓重建）
+        payload = content.encode("utf-8")
+        try:
+            with open(resolved_path, 'rb') as f:
+                # 先比较大小，大小一致时才读取全文逐字节比较
+                unchanged = os.fstat(f.fileno()).st_size == len(payload) and f.read() == payload
+        except OSError:
+            unchanged = False
+        if unchanged:
+            message = f"File '{file_path}' already has the requested content; no write needed."
+            print(message)
+            return {"status": "success", "message": message}
+
+        _write_bytes_direct(resolved_path, payload)
 
         message = f"File '{file_path}' has been successfully created/updated."
         print(message)
@@ -3884,13 +4502,24 @@ def append_file_to_file(
         return {"status": "error", "message": "Error: Source and destination files cannot be the same."}
 
     try:
-        with open(normalized_source, "r", encoding="utf-8") as f_source:
-            content_to_append = f_source.read()
-        dest_directory = os.path.dirname(normalized_dest)
-        if dest_directory:
-            os.makedirs(dest_directory, exist_ok=True)
-        with open(normalized_dest, "a", encoding="utf-8") as f_dest:
-            f_dest.write(content_to_append)
+        import shutil
+
+        _ensure_dir(os.path.dirname(normalized_dest))
+        # 🔑 不再整体 read() 入内存：优先 os.sendfile 内核态拷贝，不支持时回退 1MB 缓冲的 copyfileobj。
+        # sendfile 不接受 O_APPEND 的输出 fd，因此改为定位到文件末尾后写入；两端均为无缓冲原始 IO，回退时偏移量保持一致。
+        with open(normalized_source, "rb", buffering=0) as f_source, \
+                open(normalized_dest, "r+b" if os.path.exists(normalized_dest) else "wb", buffering=0) as f_dest:
+            f_dest.seek(0, os.SEEK_END)
+            remaining = os.fstat(f_source.fileno()).st_size
+            try:
+                while remaining > 0:
+                    sent = os.sendfile(f_dest.fileno(), f_source.fileno(), None, remaining)
+                    if sent == 0:
+                        break
+                    remaining -= sent
+            except (AttributeError, OSError):
+                pass
+            shutil.copyfileobj(f_source, f_dest, length=1024 * 1024)
         return {"status": "success",
                 "message": f"Successfully appended the content of '{source_path}' to '{destination_path}'."}
     except Exception as e:
@@ -3929,9 +4558,7 @@ def append_string_to_file(
         }
 
     try:
-        directory = os.path.dirname(normalized_path)
-        if directory:
-            os.makedirs(directory, exist_ok=True)
+        _ensure_dir(os.path.dirname(normalized_path))
         with open(normalized_path, "a", encoding="utf-8") as f:
             f.write(content)
         return {"status": "success", "message": f"Content successfully appended to file '{file_path}'."}
@@ -4013,8 +4640,34 @@ def prompt_generate_tool(
 
     PROMPT_DIR = "generated_prompt_file"
     PROMPT_FILE_PATH = os.path.abspath(os.path.join(PROMPT_DIR, "prompt.txt"))
-    FUZZ_LOG_PATH = "fuzz_build_log_file/fuzz_build_log.txt"
-    os.makedirs(PROMPT_DIR, exist_ok=True)
+    FUZZ_LOG_PATH = FUZZ_BUILD_LOG_PATH
+    _ensure_dir(PROMPT_DIR)
+
+    def _collect_config_parts() -> List[str]:
+        # 注入 Docker/Build 配置文件：先按文件名过滤，再用 DirEntry 判断是否为文件，省去无关条目的 stat
+        with os.scandir(config_folder_path) as it:
+            config_entries = sorted(
+                (e for e in it if e.name.endswith('.sh') or 'Dockerfile' in e.name or 'project.yaml' in e.name),
+                key=lambda e: e.name
+            )
+        config_parts = []
+        for entry in config_entries:
+            if entry.is_file():
+                # 显式使用 read_file_content 确保 Safety Melt 生效
+                res_content = read_file_content(entry.path, mode="full")
+                if res_content.get("status") == "success":
+                    config_parts.append(f"\n### {entry.name} ###\n{res_content.get('content', '')}\n")
+        return config_parts
+
+    # 🔑 RAG 检索（读构建日志）、配置文件读取、浅层文件树落盘三者互不依赖：线程池并发执行，
+    # 与下方账本历史/归因工件解析重叠，总耗时约为其中最慢者而非各项之和
+    from concurrent.futures import ThreadPoolExecutor
+    io_pool = ThreadPoolExecutor(max_workers=3)
+    rag_future = io_pool.submit(few_shot_rag_retrieve, "expert_knowledge.json", FUZZ_LOG_PATH)
+    config_future = io_pool.submit(_collect_config_parts)
+    tree_future = io_pool.submit(save_file_tree_shallow, project_main_folder_path, 1,
+                                 os.path.join(PROMPT_DIR, "file_tree.txt"))
+    io_pool.shutdown(wait=False)
 
     # =================================================================
     # 1. 自动组装历史策略轨迹 (自适应节点检查)
@@ -4055,26 +4708,28 @@ def prompt_generate_tool(
     final_attribution = "N/A"
     commit_changed_path = os.path.abspath("generated_prompt_file/commit_changed.txt")
 
-    if os.path.exists(commit_changed_path):
-        try:
-            with open(commit_changed_path, 'r', encoding='utf-8') as f:
-                txt = f.read()
-                # 🔑 Optimized Parser: Detect fallback mode
-                if "[STATUS]: FAILED" in txt:
-                    causal_chain = "Localization failed. System has automatically switched to Log-Based Diagnostic Mode."
-                else:
-                    cc_match = re.search(r"\[CAUSAL_CHAIN\]\s*([\s\S]*?)(?=\n\n\[|$)", txt)
-                    if cc_match: causal_chain = cc_match.group(1).strip()
+    # 直接打开（EAFP），文件不存在时静默跳过，省去一次 exists 探测
+    try:
+        with open(commit_changed_path, 'r', encoding='utf-8') as f:
+            txt = f.read()
+            # 🔑 Optimized Parser: Detect fallback mode
+            if "[STATUS]: FAILED" in txt:
+                causal_chain = "Localization failed. System has automatically switched to Log-Based Diagnostic Mode."
+            else:
+                cc_match = re.search(r"\[CAUSAL_CHAIN\]\s*([\s\S]*?)(?=\n\n\[|$)", txt)
+                if cc_match: causal_chain = cc_match.group(1).strip()
 
-                fa_match = re.search(r"\[FINAL_ATTRIBUTION\]\s*([\s\S]*)$", txt)
-                if fa_match: final_attribution = fa_match.group(1).strip()
-        except Exception as e:
-            print(f"Warning: Failed to parse commit_changed.txt: {e}")
+            fa_match = re.search(r"\[FINAL_ATTRIBUTION\]\s*([\s\S]*)$", txt)
+            if fa_match: final_attribution = fa_match.group(1).strip()
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Warning: Failed to parse commit_changed.txt: {e}")
 
     # =================================================================
     # 3. 物理触发 Few-shot RAG 检索
     # =================================================================
-    rag_res = few_shot_rag_retrieve("expert_knowledge.json", FUZZ_LOG_PATH)
+    rag_res = rag_future.result()
     expert_context = rag_res.get("rag_context", "No expert knowledge matched.")
 
     # =================================================================
@@ -4082,40 +4737,44 @@ def prompt_generate_tool(
     # =================================================================
     project_name = os.path.basename(os.path.abspath(project_main_folder_path))
 
-    with open(PROMPT_FILE_PATH, "w", encoding="utf-8") as f:
-        f.write(f"Testing Expert. Project: {project_name}. Attempt: {attempt_id}\n")
+    # 🔑 各段先累积到内存 parts，最后一次性落盘，避免多次小块写入
+    parts = [f"Testing Expert. Project: {project_name}. Attempt: {attempt_id}\n"]
 
-        f.write("\n--- 【LAST BUILD VALIDATION (1+2+6 CRITERIA)】 ---\n")
-        for k in ["step_1_official_list", "step_2_infra_compliance", "step_6_runtime_stability"]:
-            f.write(f"{k.upper()}: {validation_report.get(k, 'N/A')}\n")
+    parts.append("\n--- 【LAST BUILD VALIDATION (1+2+6 CRITERIA)】 ---\n")
+    for k in ["step_1_official_list", "step_2_infra_compliance", "step_6_runtime_stability"]:
+        parts.append(f"{k.upper()}: {validation_report.get(k, 'N/A')}\n")
 
-        f.write(f"\n【STRATEGIC KNOWLEDGE (RAG)】\n{expert_context}\n")
-        f.write(f"\n【CAUSAL_CHAIN】\n{causal_chain}\n")
-        f.write(f"\n【FINAL_ATTRIBUTION】\n{final_attribution}\n")
-        f.write(f"\n【REPAIR_HISTORY_TRAJECTORY】\n{enhanced_history}\n")
+    parts.append(f"\n【STRATEGIC KNOWLEDGE (RAG)】\n{expert_context}\n")
+    parts.append(f"\n【CAUSAL_CHAIN】\n{causal_chain}\n")
+    parts.append(f"\n【FINAL_ATTRIBUTION】\n{final_attribution}\n")
+    parts.append(f"\n【REPAIR_HISTORY_TRAJECTORY】\n{enhanced_history}\n")
+    # 上一轮补丁未改变任何文件（rebuild_gate 跳过了重建）：提示 solver 换一种修改
+    noop_note = session.state.get("noop_patch_note")
+    if noop_note:
+        parts.append(f"\n【PREVIOUS PATCH WAS A NO-OP】\n{noop_note}\n")
 
-        # 注入 Docker/Build 配置文件
-        for fname in sorted(os.listdir(config_folder_path)):
-            file_abs_path = os.path.join(config_folder_path, fname)
-            if os.path.isfile(file_abs_path) and (
-                    fname.endswith('.sh') or 'Dockerfile' in fname or 'project.yaml' in fname):
-                # 显式使用 read_file_content 确保 Safety Melt 生效
-                res_content = read_file_content(file_abs_path, mode="full")
-                if res_content.get("status") == "success":
-                    f.write(f"\n### {fname} ###\n{res_content.get('content', '')}\n")
+    parts.extend(config_future.result())
+
+    # 等待浅层文件树记录完成
+    tree_future.result()
 
-        # 记录浅层文件树
-        save_file_tree_shallow(project_main_folder_path, 1, os.path.join(PROMPT_DIR, "file_tree.txt"))
+    # 注入日志尾部上下文 (严格限制长度)
+    if os.path.exists(FUZZ_LOG_PATH):
+        # 只取最后 12000 字符，约 2000-3000 Token；优先使用构建工具写入会话的内存尾部，缺失时再从文件末尾回退读取
+        log_tail = session.state.get("fuzz_build_log_tail")
+        if not isinstance(log_tail, str):
+            log_tail = _read_tail_chars(FUZZ_LOG_PATH, 12000)
+        parts.append(f"\n\n--- BUILD LOG TAIL ---\n{_collapse_repeated_lines(log_tail)}")
 
-        # 注入日志尾部上下文 (严格限制长度)
-        if os.path.exists(FUZZ_LOG_PATH):
-            with open(FUZZ_LOG_PATH, 'r', encoding='utf-8', errors='ignore') as lf:
-                # 只取最后 12000 字符，约 2000-3000 Token
-                f.write(f"\n\n--- BUILD LOG TAIL ---\n{lf.read()[-12000:]}")
+    _write_text_direct(PROMPT_FILE_PATH, "".join(parts))
 
     # 5. 最终截断保护 (由外部配置决定阈值)
+    # 行数直接在内存中统计（与按行迭代文件的计数一致），未超限时不再回读刚写入的 prompt.txt
     limit_lines = globals().get("MAX_LINES_LIMIT", 2500)
-    truncate_prompt_file(PROMPT_FILE_PATH, max_lines=limit_lines)
+    last_part = next((p for p in reversed(parts) if p), "")
+    line_count = sum(p.count("\n") for p in parts) + (1 if last_part and not last_part.endswith("\n") else 0)
+    if line_count > limit_lines:
+        truncate_prompt_file(PROMPT_FILE_PATH, max_lines=limit_lines)
 
     return {"status": "success", "content": "Prompt successfully assembled."}
 
@@ -4145,6 +4804,55 @@ def _auto_discover_project_symbols(binary_path: str, project_name: str) -> Optio
         logger.debug(f"Cleanup step failed (non-fatal): {e}")
 
 
+# 🔑 预构建清理只涉及 Docker 容器与残留进程，与工作区文件无关：补丁落盘后即可后台执行，
+# 与 applier 的快照提交/账本回填重叠；run_fuzz_build_and_validate 开头按 (oss_fuzz_path, project_name) 汇合，
+# 且仅当调度时的构建令牌与本次构建一致时才认领，否则照常同步清理
+_PREBUILD_CLEANUP_EXECUTOR = None
+_PREBUILD_CLEANUP_FUTURES: Dict[Tuple[str, str], Tuple[str, Any]] = {}
+
+
+def prebuild_cleanup_token(state: Optional[Dict[str, Any]]) -> Optional[str]:
+    """由会话状态中的 (attempt_id, round_id) 生成构建令牌：同一轮次内补丁落盘与随后的构建得到相同令牌。"""
+    if not state or state.get("attempt_id") is None:
+        return None
+    return f"{state.get('attempt_id')}:{state.get('round_id', 0)}"
+
+
+def schedule_prebuild_cleanup(oss_fuzz_path: str, project_name: str, token: str) -> None:
+    """在后台提前执行下一次构建的预清理（单工作线程，按提交顺序串行）。"""
+    global _PREBUILD_CLEANUP_EXECUTOR
+    from concurrent.futures import ThreadPoolExecutor
+
+    if _PREBUILD_CLEANUP_EXECUTOR is None:
+        _PREBUILD_CLEANUP_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prebuild-cleanup")
+    key = (os.path.abspath(oss_fuzz_path), project_name)
+    _PREBUILD_CLEANUP_FUTURES[key] = (token, _PREBUILD_CLEANUP_EXECUTOR.submit(_cleanup_environment, oss_fuzz_path,
+                                                                               project_name))
+
+
+def _await_prebuild_cleanup(oss_fuzz_path: str, project_name: str, token: Optional[str]) -> bool:
+    """
+    汇合已提前调度的预清理：令牌一致时返回 True；无待汇合任务或令牌不符（上一次尝试/其他构建遗留）时返回 False，
+    由调用方同步执行清理。遗留任务同样先等待结束，避免其与本次构建重叠。
+    """
+    entry = _PREBUILD_CLEANUP_FUTURES.pop((os.path.abspath(oss_fuzz_path), project_name), None)
+    if entry is None:
+        return False
+    scheduled_token, future = entry
+    future.result()
+    return token is not None and scheduled_token == token
+
+
+def discard_prebuild_cleanups() -> None:
+    """等待并清空全部已调度的预清理：每次尝试开始与项目结束时调用，遗留任务不会被后续构建认领。"""
+    while _PREBUILD_CLEANUP_FUTURES:
+        _, (_, future) = _PREBUILD_CLEANUP_FUTURES.popitem()
+        try:
+            future.result()
+        except Exception as e:
+            print(f"--- ⚠️ Discarded pre-build cleanup failed: {e} ---")
+
+
 def _cleanup_environment(oss_fuzz_path: str, project_name: str):
     """
     全方位立体强杀：从项目镜像、Runner镜像、物理挂载卷三个维度彻底解除锁定。
@@ -4161,26 +4869,27 @@ def _cleanup_environment(oss_fuzz_path: str, project_name: str):
             volume_filter = f"volume={host_out_dir}"
             subprocess.run(
                 f"docker rm -f $(docker ps -a -q --filter {volume_filter}) 2>/dev/null",
-                shell=True, capture_output=True, timeout=10
+                shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10
             )
 
         # 2. 强杀属于该项目的构建容器
         project_filter = f"ancestor=gcr.io/oss-fuzz/{project_name}"
         subprocess.run(
             f"docker rm -f $(docker ps -a -q --filter {project_filter}) 2>/dev/null",
-            shell=True, capture_output=True, timeout=10
+            shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10
         )
 
         # 3. 强杀所有潜在残留的 base-runner 容器（带各种 Tag 的通配过滤）
         runner_filter = "ancestor=gcr.io/oss-fuzz-base/base-runner"
         subprocess.run(
             f"docker rm -f $(docker ps -a -q --filter {runner_filter}) 2>/dev/null",
-            shell=True, capture_output=True, timeout=10
+            shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=10
         )
 
         # 4. 后台残留进程安全扫描（如果 docker 层面清理完仍有锁，强杀对应宿主机残留影子进程）
         # 利用 pkill 杀掉可能脱离容器的宿主机 afl-fuzz 孤儿进程
-        subprocess.run("pkill -9 -f afl-fuzz 2>/dev/null", shell=True, capture_output=True)
+        subprocess.run("pkill -9 -f afl-fuzz 2>/dev/null", shell=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
     except Exception as e:
         print(f"[*] Comprehensive cleanup encountered a warning: {e}")
@@ -4301,21 +5010,26 @@ def list_files_in_dir(
         visited_real_paths.add(real_path)
 
         try:
-            entries = sorted(os.listdir(current))
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
         except PermissionError:
             return
 
         for entry in entries:
             if len(results) >= max_results:
                 break
-            full_path = os.path.join(current, entry)
+            full_path = entry.path
             rel_path = os.path.relpath(full_path, normalized_dir)
+            # 🔐 follow_symlinks=False：真实目录才算目录，符号链接目录既不标记为 dir 也不递归
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
 
-            if fnmatch.fnmatch(entry, pattern) or fnmatch.fnmatch(rel_path, f"*{pattern}*"):
-                is_dir = os.path.isdir(full_path) and not os.path.islink(full_path)  # 🔐 排除符号链接目录
+            if fnmatch.fnmatch(entry.name, pattern) or fnmatch.fnmatch(rel_path, f"*{pattern}*"):
                 results.append({"path": rel_path, "type": "dir" if is_dir else "file"})
 
-            if os.path.isdir(full_path) and not os.path.islink(full_path):  # 🔐 不递归符号链接
+            if is_dir:
                 _traverse(full_path, depth + 1)
 
     _traverse(normalized_dir, 0)
@@ -4482,16 +5196,18 @@ def git_revert_counterfactual(repo_path: str, target_commit: str, project_name:
     ).stdout.strip()
 
     # 使用 git stash 暂存所有工作区修改与未跟踪文件
-    subprocess.run(["git", "-C", repo_path, "stash", "--include-untracked"], capture_output=True)
+    subprocess.run(["git", "-C", repo_path, "stash", "--include-untracked"],
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     try:
         # 2. 执行 revert 并截获冲突状态
         revert_res = subprocess.run(
             ["git", "-C", repo_path, "revert", "--no-edit", target_commit],
-            capture_output=True
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
         )
         if revert_res.returncode != 0:
             # revert 过程若产生合并冲突，执行 abort 放弃冲突状态并安全退出
-            subprocess.run(["git", "-C", repo_path, "revert", "--abort"], capture_output=True)
+            subprocess.run(["git", "-C", repo_path, "revert", "--abort"],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             return False
 
         # 3. 执行构建校验 (下游验证，mount_path = None)
@@ -4509,9 +5225,10 @@ def git_revert_counterfactual(repo_path: str, target_commit: str, project_name:
         return False
     finally:
         # 4. 无论中间是否发生异常，强制无损重置回我们保存好的 orig_head 物理锚点
-        subprocess.run(["git", "-C", repo_path, "reset", "--hard", orig_head], capture_output=True)
-        subprocess.run(["git", "-C", repo_path, "clean", "-fdx"], capture_output=True)
-        subprocess.run(["git", "-C", repo_path, "stash", "pop"], capture_output=True)
+        subprocess.run(["git", "-C", repo_path, "reset", "--hard", orig_head],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.run(["git", "-C", repo_path, "clean", "-fdx"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.run(["git", "-C", repo_path, "stash", "pop"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
 
 def run_ecrcl_localization(
@@ -4577,26 +5294,25 @@ ECRCL disabled.
         is_downstream = (root_cause_workspace.upper() == "DOWNSTREAM")
         active_workspace = os.path.abspath(oss_fuzz_path) if is_downstream else os.path.abspath(project_source_path)
 
-        log_artifact_path = os.path.abspath("fuzz_build_log_file/fuzz_build_log.txt")
+        log_artifact_path = os.path.abspath(FUZZ_BUILD_LOG_PATH)
         failure_region_text = "N/A"
         top_1_file = "N/A"
         line_number = "N/A"
 
         try:
             if os.path.exists(log_artifact_path):
-                with open(log_artifact_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    log_lines = f.read().splitlines()
-                tail_lines = log_lines[-40:] if log_lines else []
+                # 仅需末尾 40 行：反向定位尾部切片，不整份读取构建日志
+                tail_lines = _read_tail_lines(log_artifact_path, 40).splitlines()[-40:]
                 if tail_lines:
                     failure_region_text = "\n".join(tail_lines)
                     matched_idx = -1
                     for i in range(len(tail_lines) - 1, -1, -1):
-                        if any(kw in tail_lines[i].lower() for kw in ["error:", "cannot ", "fail", "undefined reference"]):
+                        if _FAILURE_LINE_RE.search(tail_lines[i]):
                             matched_idx = i
                             break
                     if matched_idx == -1:
                         for i in range(len(tail_lines) - 1, -1, -1):
-                            if any(kw in tail_lines[i].lower() for kw in ["warning:", "exit status"]):
+                            if _WARNING_LINE_RE.search(tail_lines[i]):
                                 matched_idx = i
                                 break
                     if matched_idx != -1:
@@ -4711,8 +5427,7 @@ ECRCL disabled.
             if not os.path.exists(log_path):
                 return finalize_localization("FAILED", f"Log file not found: {log_path}")
 
-            with open(log_path, 'r', encoding='utf-8', errors='ignore') as f:
-                log_raw = f.read()
+            log_raw = _read_log_capped(log_path)
 
             val_marker = "--- VALIDATION SUMMARY"
             raw_compile_zone = log_raw.split(val_marker)[0] if val_marker in log_raw else log_raw
@@ -4720,13 +5435,13 @@ ECRCL disabled.
 
             matched_idx = -1
             for i in range(len(log_lines) - 1, -1, -1):
-                if any(kw in log_lines[i].lower() for kw in ["error:", "cannot ", "fail", "undefined reference"]):
+                if _FAILURE_LINE_RE.search(log_lines[i]):
                     matched_idx = i
                     break
 
             if matched_idx == -1:
                 for i in range(len(log_lines) - 1, -1, -1):
-                    if any(kw in log_lines[i].lower() for kw in ["warning:", "exit status"]):
+                    if _WARNING_LINE_RE.search(log_lines[i]):
                         matched_idx = i
                         break
 
@@ -4906,7 +5621,7 @@ ECRCL disabled.
                         # [上游] 走双节点 checkout + compile 因果检验逻辑
                         # A. 物理暂存现场，避免切换分支遗失文件
                         subprocess.run(["git", "-C", active_workspace, "stash", "--include-untracked"],
-                                       capture_output=True)
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
                         orig_head = subprocess.run(["git", "-C", active_workspace, "rev-parse", "HEAD"],
                                                    capture_output=True, text=True).stdout.strip()
 
@@ -4944,8 +5659,10 @@ ECRCL disabled.
 
                         # D. 强制复原上游仓库现场
                         checkout_project_commit(active_workspace, orig_head)
-                        subprocess.run(["git", "-C", active_workspace, "clean", "-fdx"], capture_output=True)
-                        subprocess.run(["git", "-C", active_workspace, "stash", "pop"], capture_output=True)
+                        subprocess.run(["git", "-C", active_workspace, "clean", "-fdx"],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                        subprocess.run(["git", "-C", active_workspace, "stash", "pop"],
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
                     # 判定因果链：剔除代码能编过 且 保留代码编不过 => 判定该候选为因果根因
                     if parent_passed and suspect_failed:
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import agent
+import agent_tools
+from google.adk.events import Event
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+
+def _summary_tail(step_2_result: str) -> str:
+    # 🔑 与 run_fuzz_build_and_validate 写入日志的 VALIDATION SUMMARY 表行格式保持一致
+    rows = []
+    for i, value in enumerate(["pass: 1 target(s) (primary: fuzz)", step_2_result, "pending"], 1):
+        marker = "[MANDATORY]" if i == 2 else "[REFERENCE]"
+        rows.append(f"Step {i:<4} {marker:<12} | {value}\n")
+    return "build output...\n" + "".join(rows) + "RESULT: done\n"
+
+
+class TestStep2Decision(unittest.TestCase):
+    """Step 2 success detection used by decision_node and its log fallback"""
+
+    def test_report_pass(self):
+        self.assertTrue(agent._is_step_2_success({"step_2_infra_compliance": "pass"}))
+        self.assertTrue(agent._is_step_2_success({"step_2_infra_compliance": " pass\n"}))
+
+    def test_report_fail_or_pending(self):
+        self.assertFalse(agent._is_step_2_success({"step_2_infra_compliance": "fail: check_build timeout"}))
+        self.assertFalse(agent._is_step_2_success({"step_2_infra_compliance": "pending"}))
+
+    def test_report_malformed(self):
+        self.assertFalse(agent._is_step_2_success({}))
+        self.assertFalse(agent._is_step_2_success(None))
+        self.assertFalse(agent._is_step_2_success("pass"))
+        self.assertFalse(agent._is_step_2_success({"step_2_infra_compliance": "passed?"}))
+
+    def test_log_pass(self):
+        self.assertTrue(agent._log_reports_step_2_pass(_summary_tail("pass")))
+
+    def test_log_fail(self):
+        self.assertFalse(agent._log_reports_step_2_pass(_summary_tail("fail: check_build timeout")))
+        self.assertFalse(agent._log_reports_step_2_pass(_summary_tail("pending")))
+
+    def test_log_fail_mentioning_pass(self):
+        # stderr 片段中夹带 pass 字样的失败行不能被误判为通过
+        self.assertFalse(agent._log_reports_step_2_pass(_summary_tail("fail: bypass of seccomp not allowed")))
+
+    def test_log_malformed(self):
+        self.assertFalse(agent._log_reports_step_2_pass(""))
+        self.assertFalse(agent._log_reports_step_2_pass(None))
+        self.assertFalse(agent._log_reports_step_2_pass("Step 2 pass\n"))
+        self.assertFalse(agent._log_reports_step_2_pass("  Step 2    [MANDATORY]  | pass\n"))
+
+
+class TestSetupFastPath(unittest.TestCase):
+    """Ready and fallback routes of the deterministic initial setup"""
+
+    PARAMS = {
+        "project_name": "zlib", "oss_fuzz_sha": "a" * 40, "software_repo_url": "https://github.com/madler/zlib",
+        "software_sha": "b" * 40, "engine": "libfuzzer", "sanitizer": "address", "architecture": "x86_64",
+        "base_image_digest": "sha256:" + "c" * 64,
+    }
+    SOURCE_PATH = "process/project/zlib"
+
+    def setUp(self):
+        self.init_calls = []
+        self.init_results = {}
+        success = mock.Mock(return_value={"status": "success"})
+        patches = {
+            "download_github_repo": success, "force_clean_git_repo": success,
+            "checkout_oss_fuzz_commit": success, "checkout_project_commit": success,
+            "patch_project_dockerfile": success,
+            "extract_build_metadata_from_log": mock.Mock(return_value={"status": "error"}),
+            "get_project_paths": mock.Mock(return_value={
+                "project_source_path": self.SOURCE_PATH, "project_config_path": "oss-fuzz/projects/zlib",
+                "project_config_repo_path": "oss-fuzz"}),
+            "manage_git_state": self._fake_manage_git_state,
+        }
+        for name, fake in patches.items():
+            patcher = mock.patch.object(agent, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _fake_manage_git_state(self, path, action):
+        self.init_calls.append((path, action, threading.get_ident()))
+        return self.init_results.get(path, {"status": "success"})
+
+    def _run(self, params):
+        return asyncio.run(agent._setup_fast_path(json.dumps(params) if isinstance(params, dict) else params))
+
+    def test_ready_route_initializes_each_workspace_once_on_loop_thread(self):
+        event = self._run(self.PARAMS)
+        self.assertEqual(event.actions.route, "ready")
+        info = event.actions.state_delta["basic_information"]
+        self.assertEqual(info["project_source_path"], self.SOURCE_PATH)
+        self.assertEqual(info["software_sha"], "b" * 40)
+        self.assertEqual([(p, a) for p, a, _ in self.init_calls],
+                         [("./oss-fuzz", "init"), (self.SOURCE_PATH, "init")])
+        # manage_git_state 会 os.chdir，必须与调用方处于同一线程
+        self.assertEqual({t for _, _, t in self.init_calls}, {threading.get_ident()})
+
+    def test_fallback_on_unparseable_input(self):
+        event = self._run("not json")
+        self.assertEqual(event.actions.route, "fallback")
+        self.assertEqual(self.init_calls, [])
+
+    def test_fallback_on_missing_repo_metadata_skips_init(self):
+        event = self._run({**self.PARAMS, "software_sha": ""})
+        self.assertEqual(event.actions.route, "fallback")
+        self.assertEqual(self.init_calls, [])
+
+    def test_fallback_when_oss_fuzz_init_fails(self):
+        self.init_results["./oss-fuzz"] = {"status": "error", "message": "boom"}
+        event = self._run(self.PARAMS)
+        self.assertEqual(event.actions.route, "fallback")
+        self.assertEqual([p for p, _, _ in self.init_calls], ["./oss-fuzz"])
+
+    def test_source_init_failure_does_not_fall_back(self):
+        # oss-fuzz 已初始化后不再交由 LLM 兜底，避免同一工作区二次初始化
+        self.init_results[self.SOURCE_PATH] = {"status": "error", "message": "boom"}
+        with self.assertRaises(RuntimeError):
+            self._run(self.PARAMS)
+        self.assertEqual([p for p, _, _ in self.init_calls], ["./oss-fuzz", self.SOURCE_PATH])
+
+
+class TestPrebuildCleanupToken(unittest.TestCase):
+    """The pre-build cleanup token must survive the real session store on both the scheduling and build sides"""
+
+    def setUp(self):
+        patcher = mock.patch.object(agent_tools, "_cleanup_environment")
+        self.cleanup = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(agent_tools.discard_prebuild_cleanups)
+
+    async def _tokens(self):
+        service = InMemorySessionService()
+        session = await agent._create_attempt_session(service, "session_test", 3)
+        # 🔑 get_session 返回深拷贝：改写副本不会影响存储会话
+        session.state["attempt_id"] = 99
+        stored = await service.get_session(app_name=agent.APP_NAME, user_id=agent.USER_ID, session_id="session_test")
+        first = agent_tools.prebuild_cleanup_token(stored.state)
+        # router_node 以事件 state_delta 推进轮次
+        await service.append_event(stored, Event(author="router_node", state={"round_id": 2}))
+        stored = await service.get_session(app_name=agent.APP_NAME, user_id=agent.USER_ID, session_id="session_test")
+        return first, stored
+
+    def test_token_persists_through_session_service(self):
+        first, stored = asyncio.run(self._tokens())
+        self.assertEqual(first, "3:0")
+        self.assertEqual(agent_tools.prebuild_cleanup_token(stored.state), "3:2")
+
+    def test_build_side_consumes_scheduled_cleanup(self):
+        _, stored = asyncio.run(self._tokens())
+        # 编排层在 apply_patch 响应后调度；构建工具经 tool_context.session.state 取得同一令牌
+        agent_tools.schedule_prebuild_cleanup("/tmp/oss-fuzz", "zlib", agent_tools.prebuild_cleanup_token(stored.state))
+        tool_context = SimpleNamespace(session=stored)
+        build_token = agent_tools.prebuild_cleanup_token(tool_context.session.state)
+        self.assertTrue(agent_tools._await_prebuild_cleanup("/tmp/oss-fuzz", "zlib", build_token))
+        self.cleanup.assert_called_once_with("/tmp/oss-fuzz", "zlib")
+
+
+def _patch_event(response):
+    part = types.Part(function_response=types.FunctionResponse(name="apply_patch", response=response))
+    return Event(author="solution_applier_agent", content=types.Content(role="user", parts=[part]))
+
+
+def _solver_event():
+    return Event(author="fuzzing_solver_agent", content=types.Content(role="model", parts=[types.Part(text="ok")]))
+
+
+class TestRebuildGate(unittest.TestCase):
+    """A patch that changes no files skips the rebuild but keeps the attempt alive"""
+
+    def test_noop_patch_routes_to_router_with_note(self):
+        event = agent._rebuild_gate([_solver_event(), _patch_event({"status": "success", "changed_files_count": 0})])
+        self.assertEqual(event.actions.route, "noop")
+        self.assertEqual(event.actions.state_delta["noop_patch_note"], agent._NOOP_PATCH_NOTE)
+
+    def test_changed_patch_rebuilds_and_clears_note(self):
+        event = agent._rebuild_gate([_solver_event(), _patch_event({"status": "success", "changed_files_count": 2})])
+        self.assertEqual(event.actions.route, "rebuild")
+        self.assertEqual(event.actions.state_delta["noop_patch_note"], "")
+
+    def test_failed_patch_rebuilds(self):
+        event = agent._rebuild_gate([_solver_event(), _patch_event({"status": "error", "changed_files_count": 0})])
+        self.assertEqual(event.actions.route, "rebuild")
+
+    def test_previous_round_response_is_ignored(self):
+        # 本轮 applier 未调用 apply_patch：上一轮的 no-op 响应不能跳过本轮重建
+        events = [_patch_event({"status": "success", "changed_files_count": 0}), _solver_event()]
+        self.assertEqual(agent._rebuild_gate(events).actions.route, "rebuild")
+        self.assertEqual(agent._rebuild_gate([]).actions.route, "rebuild")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,253 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import openpyxl
+
+import agent_tools
+
+
+class TestReadProjectsFromExcel(unittest.TestCase):
+    """Sheet selection, formula semantics and short-row handling of read_projects_from_excel"""
+
+    HEADERS = ["项目名称", "复现oss-fuzz SHA", "报错是否一致", "是否尝试修复"]
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.xlsx_path = os.path.join(self.temp_dir.name, "projects.xlsx")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _build_workbook(self, rows, active_index=1):
+        # 🔑 第一张表为干扰表，目标数据位于活动工作表（默认第二张）
+        workbook = openpyxl.Workbook()
+        decoy = workbook.active
+        decoy.title = "decoy"
+        decoy.append(self.HEADERS)
+        decoy.append(["decoy-project", "0" * 40, "是", "否"])
+        sheet = workbook.create_sheet("projects")
+        sheet.append(self.HEADERS)
+        for row in rows:
+            sheet.append(row)
+        workbook.active = active_index
+        workbook.save(self.xlsx_path)
+
+    def test_reads_active_sheet_and_filters_rows(self):
+        self._build_workbook([
+            ["zlib", "a" * 40, "是", "否"],
+            ["lwan", "b" * 40, "否", "否"],
+            ["curl", "c" * 40, "是", "是"],
+            ["expat", "d" * 40, "是", None],
+        ])
+        result = agent_tools.read_projects_from_excel(self.xlsx_path)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(
+            [(p["project_name"], p["row_index"]) for p in result["projects"]],
+            [("zlib", 2), ("expat", 5)],
+        )
+
+    def test_first_sheet_when_it_is_active(self):
+        self._build_workbook([["zlib", "a" * 40, "是", "否"]], active_index=0)
+        result = agent_tools.read_projects_from_excel(self.xlsx_path)
+        self.assertEqual([p["project_name"] for p in result["projects"]], ["decoy-project"])
+
+    def test_formula_cells_keep_formula_text(self):
+        # 公式单元格与基线一致读取为公式文本，而非缓存值
+        self._build_workbook([['=LOWER("ZLIB")', "a" * 40, "是", "否"]])
+        result = agent_tools.read_projects_from_excel(self.xlsx_path)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual([p["project_name"] for p in result["projects"]], ['=LOWER("ZLIB")'])
+
+    def test_short_rows_are_padded(self):
+        self._build_workbook([["zlib", "a" * 40, "是", "否"]])
+        short_rows = iter([tuple(self.HEADERS), ("zlib", "a" * 40, "是"), ("curl",)])
+        fake_workbook = mock.MagicMock()
+        fake_workbook.active.iter_rows.return_value = short_rows
+        with mock.patch.object(agent_tools.openpyxl, "load_workbook", return_value=fake_workbook):
+            result = agent_tools.read_projects_from_excel(self.xlsx_path)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual([(p["project_name"], p["row_index"]) for p in result["projects"]], [("zlib", 2)])
+        fake_workbook.close.assert_called_once()
+
+
+class TestApplyPatch(unittest.TestCase):
+    """All-or-nothing semantics and changed_files_count reporting of apply_patch"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.base_dir = self.temp_dir.name
+        self.old_cwd = os.getcwd()
+        os.chdir(self.base_dir)
+        self.src_dir = os.path.join(self.base_dir, "process", "project", "demo")
+        os.makedirs(self.src_dir)
+        self.files = {
+            "a.c": "int a(void) {\n    return 1;\n}\n",
+            "b.c": "int b(void) {\n    return 2;\n}\n",
+        }
+        for name, text in self.files.items():
+            with open(os.path.join(self.src_dir, name), "w", encoding="utf-8") as f:
+                f.write(text)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.temp_dir.cleanup()
+
+    def _read(self, name):
+        with open(os.path.join(self.src_dir, name), encoding="utf-8") as f:
+            return f.read()
+
+    def _apply(self, blocks):
+        # 🔑 按 solution.txt 的块格式拼接补丁，目标路径相对 base_dir
+        parts = []
+        for name, original, replacement in blocks:
+            parts.append(
+                f"---=== FILE ===---\nprocess/project/demo/{name}\n"
+                f"---=== ORIGINAL ===---\n{original}\n"
+                f"---=== REPLACEMENT ===---\n{replacement}\n"
+            )
+        with open(os.path.join(self.base_dir, "solution.txt"), "w", encoding="utf-8") as f:
+            f.write("".join(parts))
+        return agent_tools.apply_patch("solution.txt", base_dir=self.base_dir)
+
+    def test_multi_file_success(self):
+        result = self._apply([
+            ("a.c", "    return 1;", "    return 10;"),
+            ("b.c", "    return 2;", "    return 20;"),
+        ])
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["modified_files_count"], 2)
+        self.assertEqual(result["changed_files_count"], 2)
+        self.assertIn("return 10;", self._read("a.c"))
+        self.assertIn("return 20;", self._read("b.c"))
+
+    def test_partial_failure_rolls_back_every_file(self):
+        result = self._apply([
+            ("a.c", "    return 1;", "    return 10;"),
+            ("b.c", "    return 99;", "    return 20;"),
+        ])
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(result["modified_files_count"], 0)
+        self.assertEqual(result["changed_files_count"], 0)
+        self.assertEqual(len(result["errors"]), 1)
+        self.assertIn("MATCH FAILED", result["errors"][0])
+        # 成功匹配的 a.c 也不得落盘
+        self.assertEqual(self._read("a.c"), self.files["a.c"])
+        self.assertEqual(self._read("b.c"), self.files["b.c"])
+
+    def test_zero_change_patch(self):
+        # 替换内容已存在于文件中：块计为已应用，但没有文件被改写
+        mtime = os.stat(os.path.join(self.src_dir, "a.c")).st_mtime_ns
+        result = self._apply([("a.c", "    return 0;", "    return 1;")])
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["modified_files_count"], 1)
+        self.assertEqual(result["changed_files_count"], 0)
+        self.assertEqual(result["changed_files"], [])
+        self.assertEqual(self._read("a.c"), self.files["a.c"])
+        self.assertEqual(os.stat(os.path.join(self.src_dir, "a.c")).st_mtime_ns, mtime)
+
+    def test_staging_failure_leaves_no_temp_files(self):
+        with mock.patch.object(agent_tools, "_stage_text_file",
+                               side_effect=[os.path.join(self.src_dir, ".staged"), OSError("disk full")]):
+            open(os.path.join(self.src_dir, ".staged"), "w").close()
+            result = self._apply([
+                ("a.c", "    return 1;", "    return 10;"),
+                ("b.c", "    return 2;", "    return 20;"),
+            ])
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(sorted(os.listdir(self.src_dir)), ["a.c", "b.c"])
+        self.assertEqual(self._read("a.c"), self.files["a.c"])
+
+
+class TestPrebuildCleanup(unittest.TestCase):
+    """Background pre-build cleanup is only consumed by the build it was scheduled for"""
+
+    OSS_FUZZ = "/tmp/oss-fuzz"
+
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch.object(agent_tools, "_cleanup_environment",
+                                    side_effect=lambda path, project: self.calls.append((path, project)))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(agent_tools.discard_prebuild_cleanups)
+        agent_tools.discard_prebuild_cleanups()
+
+    def test_token_from_attempt_and_round(self):
+        self.assertEqual(agent_tools.prebuild_cleanup_token({"attempt_id": 2, "round_id": 3}), "2:3")
+        self.assertEqual(agent_tools.prebuild_cleanup_token({"attempt_id": 1}), "1:0")
+        self.assertIsNone(agent_tools.prebuild_cleanup_token({}))
+        self.assertIsNone(agent_tools.prebuild_cleanup_token(None))
+
+    def test_matching_token_is_consumed(self):
+        agent_tools.schedule_prebuild_cleanup(self.OSS_FUZZ, "zlib", "1:2")
+        self.assertTrue(agent_tools._await_prebuild_cleanup(self.OSS_FUZZ, "zlib", "1:2"))
+        self.assertEqual(self.calls, [(self.OSS_FUZZ, "zlib")])
+        # 已认领的任务不会被再次认领
+        self.assertFalse(agent_tools._await_prebuild_cleanup(self.OSS_FUZZ, "zlib", "1:2"))
+
+    def test_stale_token_is_not_consumed(self):
+        agent_tools.schedule_prebuild_cleanup(self.OSS_FUZZ, "zlib", "1:2")
+        self.assertFalse(agent_tools._await_prebuild_cleanup(self.OSS_FUZZ, "zlib", "2:0"))
+        # 遗留任务已被等待并移除，下一次构建同样不会认领
+        self.assertEqual(self.calls, [(self.OSS_FUZZ, "zlib")])
+        self.assertFalse(agent_tools._await_prebuild_cleanup(self.OSS_FUZZ, "zlib", "1:2"))
+
+    def test_build_without_token_is_not_consumed(self):
+        # 反事实构建不带 tool_context，令牌为 None
+        agent_tools.schedule_prebuild_cleanup(self.OSS_FUZZ, "zlib", "1:2")
+        self.assertFalse(agent_tools._await_prebuild_cleanup(self.OSS_FUZZ, "zlib", None))
+
+    def test_discard_drains_every_entry(self):
+        agent_tools.schedule_prebuild_cleanup(self.OSS_FUZZ, "zlib", "1:2")
+        agent_tools.schedule_prebuild_cleanup(self.OSS_FUZZ, "expat", "1:2")
+        agent_tools.discard_prebuild_cleanups()
+        self.assertEqual(agent_tools._PREBUILD_CLEANUP_FUTURES, {})
+        self.assertEqual(sorted(p for _, p in self.calls), ["expat", "zlib"])
+        self.assertFalse(agent_tools._await_prebuild_cleanup(self.OSS_FUZZ, "zlib", "1:2"))
+
+
+class TestRunFuzzBuildSessionState(unittest.TestCase):
+    """run_fuzz_build_and_validate publishes its validation report into the workflow session"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.old_cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        self.oss_fuzz = os.path.join(self.temp_dir.name, "oss-fuzz")
+        os.makedirs(os.path.join(self.oss_fuzz, "infra"))
+        patcher = mock.patch.object(agent_tools, "_cleanup_environment")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        self.temp_dir.cleanup()
+
+    def _run(self, exit_code):
+        # 🔑 以固定退出码的 helper.py 替身模拟 build_fuzzers/check_build，不依赖 docker
+        with open(os.path.join(self.oss_fuzz, "infra", "helper.py"), "w", encoding="utf-8") as f:
+            f.write(f"import sys\nsys.exit({exit_code})\n")
+        tool_context = SimpleNamespace(session=SimpleNamespace(state={}))
+        result = agent_tools.run_fuzz_build_and_validate(
+            "zlib", self.oss_fuzz, "address", "libfuzzer", "x86_64",
+            mount_path=self.temp_dir.name, tool_context=tool_context)
+        return result, tool_context.session.state
+
+    def test_passing_build_reports_step_2_pass(self):
+        result, state = self._run(0)
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(state["last_validation_report"], result["validation_report"])
+        self.assertEqual(state["last_validation_report"]["step_2_infra_compliance"], "pass")
+        self.assertIn("fuzz_build_log_tail", state)
+
+    def test_failed_compilation_still_publishes_report(self):
+        result, state = self._run(1)
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(state["last_validation_report"]["step_2_infra_compliance"], "pending")
+
+
+if __name__ == "__main__":
+    unittest.main()